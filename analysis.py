@@ -0,0 +1,120 @@
+"""Уровни риска, цвета, средние и рекомендации по предсказанным оценкам.
+
+Все считается на массиве (учеников × 9 предметов) за один проход NumPy:
+страница ученика — случай одной строки, сводки по классам и выгрузки —
+тысяч строк тем же кодом.
+"""
+import numpy as np
+
+SUBJECTS = [
+    "Вероятность и статистика", "Геометрия", "Обществознание",
+    "Русский язык", "Современная литература", "Труд",
+    "Физ-ра", "Физика", "Химия"
+]
+SUBJECTS_COUNT = len(SUBJECTS)
+
+# Оценки, при которых предмет попадает в рекомендации и в список учеников в зоне риска
+RISK_GRADES = (2, 3)
+# Недостающие предметы и пропуски модели считаются тройкой
+FILL_GRADE = 3
+
+# Цвета по уровню риска, как на прежнем графике matplotlib
+HIGH_RISK_COLOR = '#ff5252'
+MEDIUM_RISK_COLOR = '#ffb74d'
+LOW_RISK_COLOR = '#66bb6a'
+# Номер корзины риска: 0 — низкий (уровень 1–2), 1 — средний (3), 2 — высокий (4 и выше)
+RISK_COLORS = np.array([LOW_RISK_COLOR, MEDIUM_RISK_COLOR, HIGH_RISK_COLOR])
+_BUCKET_EDGES = np.array([3, 4])
+
+
+def grade_matrix(predictions, fill=FILL_GRADE):
+    """Предсказания учеников в целочисленный массив (n, 9).
+
+    Принимает массив или список векторов оценок разной длины (None — пропуск):
+    короткие дополняются fill, длинные обрезаются до 9 предметов.
+    """
+    matrix = np.full((len(predictions), SUBJECTS_COUNT), fill, dtype=np.int64)
+    try:
+        array = np.asarray(predictions, dtype=np.float64)
+    except (TypeError, ValueError):
+        array = None
+    if array is not None and array.ndim == 2:
+        width = min(array.shape[1], SUBJECTS_COUNT)
+        array = array[:, :width]
+        matrix[:, :width] = np.where(np.isnan(array), fill, array)
+        return matrix
+    # векторы разной длины
+    for i, prediction in enumerate(predictions):
+        row = [fill if grade is None else grade for grade in list(prediction)[:SUBJECTS_COUNT]]
+        matrix[i, :len(row)] = row
+    return matrix
+
+
+def risk_levels(grades):
+    """Оценки в уровни риска: 5 → 1, 4 → 2, 3 → 3, 2 → 4."""
+    return 6 - grades
+
+
+def risk_buckets(levels):
+    return np.digitize(levels, _BUCKET_EDGES)
+
+
+def risk_colors(levels):
+    return RISK_COLORS[risk_buckets(levels)]
+
+
+def average_grades(grades):
+    return np.round(grades.mean(axis=1), 2)
+
+
+def at_risk_mask(grades):
+    return np.isin(grades, RISK_GRADES)
+
+
+def _recommendation(subjects):
+    if not subjects:
+        return "Нет предметов с низкими оценками (2 или 3)."
+    if len(subjects) == 1:
+        return f"Подтяните знания в следующем предмете: {subjects[0]}"
+    return "Подтяните знания в следующих предметах: " + ", ".join(subjects)
+
+
+# Текст рекомендации для каждого из 2^9 наборов предметов в зоне риска
+_RECOMMENDATIONS = np.array([
+    _recommendation([subject for bit, subject in enumerate(SUBJECTS) if code >> bit & 1])
+    for code in range(1 << SUBJECTS_COUNT)
+], dtype=object)
+_BITS = 1 << np.arange(SUBJECTS_COUNT)
+
+
+def recommendations(mask):
+    """Тексты рекомендаций по маске предметов в зоне риска (n, 9): поиск в таблице по битовому коду."""
+    return _RECOMMENDATIONS[mask @ _BITS]
+
+
+class Analysis:
+    """Результат analyze: массивы по ученикам (строки) и предметам (столбцы)."""
+
+    def __init__(self, grades):
+        self.grades = grades
+        self.levels = risk_levels(grades)
+        self.buckets = risk_buckets(self.levels)
+        self.colors = RISK_COLORS[self.buckets]
+        self.averages = average_grades(grades)
+        self.at_risk = at_risk_mask(grades)
+
+    def __len__(self):
+        return len(self.grades)
+
+    @property
+    def at_risk_counts(self):
+        return self.at_risk.sum(axis=1)
+
+    @property
+    def recommendations(self):
+        return recommendations(self.at_risk)
+
+
+def analyze(predictions):
+    """Уровни риска, цвета, средние и маски зоны риска для всех учеников сразу."""
+    return Analysis(grade_matrix(predictions))
@@ -1,125 +1,284 @@
-import gradio as gr
-import matplotlib.pyplot as plt
-from io import BytesIO
-import base64
-import pandas as pd
-import joblib
+import argparse
+import logging
+import os
+import threading
 import warnings
-from data_base import SavesDataUsers, SavesDataStudents
+from pathlib import Path
+from resources import DATA_PATH, startup, grades, models, model_version, on_grades_change, warm_up
+
+import numpy as np
+import gradio as gr
+startup.mark("import gradio")
+
+from html import escape
+from data_base import (SavesDataUsers, SavesDataStudents, SavesDataPredictions,
+                       SavesDataPredictionCache, UserCache)
+from prediction_cache import PredictionCache
+from analysis import SUBJECTS, analyze, grade_matrix
+from charts import GRADE_LABELS, RenderCache, render_class_chart, render_risk_chart, render_trend_chart
+import executors
+import export
+import metrics
+from data_base import get_pool
+import auth
+from executors import predict_rows, run_auth, run_cpu, run_db, run_export, run_predict
+from model_registry import ShadowScorer
+from sessions import Session, SessionStore
+from static_assets import AssetStore, PageCompression
+from trends import TrendIndex, describe_slope
+import static_assets
+from metrics import span, track
+startup.mark("import app modules")
 
 warnings.filterwarnings("ignore")
-from pathlib import Path
-BASE_DIR = Path(__file__).resolve().parent
-df = pd.read_csv(BASE_DIR / "data.csv")
+logger = logging.getLogger("app")
+
+# Повторные просмотры тех же данных не запускают модель заново; кэш сохраняется в БД
+prediction_cache_store = SavesDataPredictionCache()
+prediction_cache = PredictionCache(maxsize=4096, store=prediction_cache_store)
+
+# Готовые графики и таблицы оценок по вектору предсказаний: повторная отрисовка — поиск в словаре
+render_cache = RenderCache(max_bytes=16 * 1024 * 1024)
+
+# Стили и графики классов отдельными файлами с отпечатком в адресе и долгим кэшем браузера
+assets = AssetStore()
+
+# Ряды средней оценки по четвертям для всех учеников; пересобираются при новых оценках
+trend_index = TrendIndex(grades)
+
+# Кэш пользователей для входа; уникальный индекс по логину создается при старте
+user_cache = UserCache(ttl=60.0)
+
+# Ограничение попыток входа по логину и по IP: проверяется до обращения к БД
+login_limiter = auth.RateLimiter(auth.LOGIN_RATE, auth.LOGIN_BURST)
+ip_limiter = auth.RateLimiter(auth.IP_RATE, auth.IP_BURST)
+
+# Сессии вошедших пользователей; токен хранится в браузере (gr.BrowserState)
+sessions = SessionStore()
+
+# Модель-кандидат из реестра считается в фоне на доле запросов (python model_registry.py shadow ...)
+shadow_scorer = ShadowScorer(models.get, executors.submit_background)
+
+metrics.register_stats("app_shadow", "Теневая модель",
+                       lambda: {k: v for k, v in shadow_scorer.stats().items() if k != "version"},
+                       counters=("samples", "skipped", "errors"))
+metrics.register_stats("app_login_limit", "Ограничение попыток входа по логину", login_limiter.stats,
+                       counters=("rejected",))
+metrics.register_stats("app_ip_limit", "Ограничение попыток входа по IP", ip_limiter.stats,
+                       counters=("rejected",))
+metrics.register_stats("app_sessions", "Сессии", sessions.stats,
+                       counters=("created", "expired", "evicted"))
+metrics.register_stats("app_prediction_cache", "Кэш предсказаний", prediction_cache.stats,
+                       counters=("hits", "store_hits", "misses"))
+metrics.register_stats("app_render_cache", "Кэш графиков и таблиц", render_cache.stats,
+                       counters=("hits", "spill_hits", "misses"))
+metrics.register_stats("app_static_assets", "Статические файлы", assets.stats,
+                       counters=("hits", "not_modified", "misses", "added"))
+metrics.register_stats("app_trends", "Ряды оценок по четвертям", trend_index.stats, counters=("builds",))
+metrics.register_stats("app_db_pool", "Пул соединений с БД", lambda: get_pool().metrics(),
+                       counters=("acquires", "waits", "wait_time", "connect_time"))
+
+
+def rescore(keys):
+    """Пересчитывает сохраненные предсказания и сводки по классам для затронутых учеников."""
+    from scoring import score_keys
+
+    active = models.get().active()
+    rows = score_keys(active.model, grades.get().index, keys)
+    SavesDataPredictions().save_predictions(rows, active.version)
+
+
+# Число полных перезагрузок таблицы оценок: по нему прерывается устаревший пересчет
+grades_reloads = 0
+
+
+def rescore_all(generation):
+    """Пересчитывает все предсказания и сводки после полной перезагрузки таблицы оценок."""
+    active = models.get().active()
+    saves = SavesDataPredictions()
+    for keys, rows, lengths in export.iter_batches(grades.get().index):
+        if generation != grades_reloads:
+            # таблицу снова перезагрузили: пересчет запущен заново
+            return
+        predictions = active.model.predict(rows).tolist()
+        ends = np.cumsum(lengths).tolist()
+        saves.save_predictions(
+            ((student_id, class_num, predictions[end - length:end])
+             for (student_id, class_num), end, length in zip(keys.tolist(), ends, lengths.tolist())),
+            active.version)
+
+
+def on_new_grades(keys):
+    """Новые строки в data.csv: сбрасываем кэш только затронутых учеников.
+
+    При полной перезагрузке (CSV переписан, новый снимок) сохраненные
+    предсказания могли устареть при том же числе строк: они удаляются и
+    пересчитываются в фоне, а до конца пересчета страницы считают модель.
+    Кэш графиков адресуется по вектору оценок и сброса не требует.
+    """
+    global grades_reloads
+    if keys is None:
+        grades_reloads += 1
+        SavesDataPredictions().clear()
+        prediction_cache.invalidate()
+        sessions.forget_predictions()
+        executors.submit_background(rescore_all, grades_reloads)
+        return
+    student_ids = {student_id for student_id, _ in keys}
+    prediction_cache.invalidate(student_ids)
+    sessions.forget_predictions(student_ids)
+    executors.submit_background(rescore, keys)
 
-model = joblib.load(BASE_DIR / 'model_1.pkl')
 
-subjects = [
-    "Вероятность и статистика", "Геометрия", "Обществознание",
-    "Русский язык", "Современная литература", "Труд",
-    "Физ-ра", "Физика", "Химия"
-]
+on_grades_change(on_new_grades)
+
+
+def init_storage():
+    """Индексы и служебные таблицы БД; вызывается при старте до приема запросов."""
+    SavesDataUsers().create_indexes()
+    prediction_cache_store.create_table()
+    SavesDataPredictions().create_table()
+
+
+subjects = SUBJECTS
+# Типы пользователей со страницей учителя и выгрузкой отчетов
+STAFF_TYPES = ("teacher", "class_teacher", "director")
 
 def get_student_class_data(student_id, class_num):
     """Возвращает данные ученика для указанного класса."""
-    student_data = df[(df['Student'] == student_id) & (df['Class'] == class_num)]
-    if student_data.empty:
+    student_data = grades.get().get(student_id, class_num)
+    if student_data is None:
         raise ValueError(f"Ученик {student_id} в классе {class_num} не найден.")
     return student_data
 
 
+def find_prediction(student_id, class_num):
+    """Ищет готовое предсказание в кэше и таблице prediction.
+
+    Возвращает (ключ кэша, строки ученика, оценки или None, если нужен расчет модели).
+    """
+    with span("grades_lookup"):
+        student_data = get_student_class_data(student_id, class_num)
+    version = model_version.get()
+    with span("prediction_cache"):
+        cache_key = PredictionCache.make_key(student_id, class_num, student_data, version)
+        prediction = prediction_cache.get(cache_key)
+    if prediction is None:
+        with span("db_prediction"):
+            prediction = SavesDataPredictions().get_prediction(student_id, class_num, version, len(student_data))
+        if prediction is not None:
+            prediction_cache.put(cache_key, prediction)
+    return cache_key, student_data, prediction
+
+
 def predict_grades(student_id, class_num):
-    student_data = get_student_class_data(student_id, class_num)
-    if student_data.empty:
-        print("Ошибка: Нет данных для ученика", student_id, "в классе", class_num)
-        return [0] * 9
+    cache_key, student_data, prediction = find_prediction(student_id, class_num)
+    if prediction is None:
+        with span("inference"):
+            prediction = predict_rows(student_data)
+        prediction_cache.put(cache_key, prediction)
+    shadow_scorer.maybe_score(student_data, prediction)
+    logger.debug("Предсказанные оценки: %s", prediction)
+    return prediction
 
-    prediction = model.predict(student_data)
-    print("Предсказанные оценки:", prediction)  # Отладочный вывод
+
+async def predict_grades_async(student_id, class_num):
+    """То же, что predict_grades, но БД и модель работают в своих пулах."""
+    cache_key, student_data, prediction = await run_db(find_prediction, student_id, class_num)
+    if prediction is None:
+        with span("inference"):
+            prediction = await run_predict(student_data)
+        await run_db(prediction_cache.put, cache_key, prediction)
+    shadow_scorer.maybe_score(student_data, prediction)
+    logger.debug("Предсказанные оценки: %s", prediction)
     return prediction
 
 
 def create_risk_chart(prediction):
-    """Создает график рисков на основе предсказанных оценок."""
-    # Убедимся, что у нас ровно 9 оценок
-    prediction = prediction[:len(subjects)]
-
-    # Преобразуем оценки в уровни риска (5 → 1, 4 → 2, 3 → 3, 2 → 4)
-    risk_levels = [5 - grade + 1 for grade in prediction]  # Теперь шкала 1-4
-
-    fig, ax = plt.subplots(figsize=(10, 5))
-
-    # Цвета в зависимости от уровня риска
-    colors = []
-    for level in risk_levels:
-        if level >= 4:
-            colors.append('#ff5252')  # Красный - высокий риск
-        elif level >= 3:
-            colors.append('#ffb74d')  # Оранжевый - средний риск
-        else:
-            colors.append('#66bb6a')  # Зеленый - низкий риск
-
-    bars = ax.barh(subjects, risk_levels, color=colors, height=0.6)
-
-    # Добавляем значения на график
-    for bar in bars:
-        width = bar.get_width()
-        ax.text(width + 0.1, bar.get_y() + bar.get_height() / 2,
-                f'{width:.1f}',
-                ha='left', va='center',
-                fontsize=10, fontweight='bold')
-
-    # Настройки осей
-    ax.set_xlim(0, 5)
-    ax.set_xticks(range(0, 6))
-    ax.set_xlabel('Уровень риска (1-5)', fontsize=12)
-    ax.set_title('Риски успеваемости по предметам', fontsize=14, pad=20)
-
-    plt.tight_layout()
-    return fig
-
-def create_class_chart():
-    """Создает график успеваемости класса."""
-    grades = ['Отлично', 'Хорошо', 'Удовлетворительно', 'Неудовлетворительно']
-    counts = [8, 9, 10, 5]
-
-    fig, ax = plt.subplots(figsize=(8, 4))
-    bars = ax.bar(grades, counts, color=['#4CAF50', '#8BC34A', '#FFC107', '#F44336'])
-
-    for bar in bars:
-        height = bar.get_height()
-        ax.text(bar.get_x() + bar.get_width() / 2., height,
-                f'{height}', ha='center', va='bottom')
-
-    ax.set_ylabel('Количество учеников')
-    ax.set_title('Статистика по 10Б классу')
-    plt.tight_layout()
-
-    buf = BytesIO()
-    plt.savefig(buf, format='png', dpi=80)
-    plt.close()
-    return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode('utf-8')}"
-
-
-def get_recommendations(prediction):
-    """Формирует рекомендации на основе предсказанных оценок."""
-    risk_subjects = [subject for subject, grade in zip(subjects, prediction) if grade in (2, 3)]
-
-    if risk_subjects:
-        if len(risk_subjects) == 1:
-            return f"Подтяните знания в следующем предмете: {risk_subjects[0]}"
-        else:
-            return "Подтяните знания в следующих предметах: " + ", ".join(risk_subjects)
+    """Создает график рисков на основе предсказанных оценок (SVG без matplotlib)."""
+    with span("chart_render"):
+        return render_cache.get_or_render(
+            "risk", prediction[:len(subjects)],
+            lambda grades: f'<div class="risk-chart-container">{render_risk_chart(subjects, grades)}</div>')
+
+def class_dashboard(subject_name, class_num, class_letter):
+    """Статистика, ученики в зоне риска и рекомендации по предмету в классе.
+
+    Читает готовые сводки class_summary/class_at_risk, которые обновляются
+    вместе с таблицей prediction, а не пересчитывает всю школу.
+    """
+    if subject_name not in subjects:
+        raise gr.Error("Выберите предмет")
+    subject_idx = subjects.index(subject_name)
+    class_num = int(class_num)
+    saves = SavesDataPredictions()
+    with span("db_class_summary"):
+        counts = saves.get_class_summary(class_num, subject_idx)
+    if not counts or not sum(counts.values()):
+        empty = f"<p>Нет предсказаний для {class_num} класса. Запустите расчет: python scoring.py</p>"
+        return [empty, "", """<div class="recommendations">Нет данных для рекомендаций</div>"""]
+
+    total = sum(counts.values())
+    average = sum(grade * count for grade, count in counts.items()) / total
+    # Литер класса не хранится ни в data.csv, ни в БД: статистика по всей параллели
+    title = f"{subject_name}: {class_num} классы"
+    items = "".join(f"<li><strong>{counts[grade]} - {label}</strong></li>" for grade, label in GRADE_LABELS.items())
+    stats_html = f"""
+            <div>
+                <img src="{assets.add('class-chart', render_class_chart(counts, title), 'svg')}" alt="{escape(title)}"
+                     style="width: 100%; max-width: 500px; margin: 0 auto; display: block;">
+                <ul style="margin-top: 20px;">{items}</ul>
+                <p>Средняя оценка по классу: <strong>{GRADE_LABELS[round(average)]} - {average:.2f}</strong></p>
+                <p>Литер класса «{escape(str(class_letter or ""))}» в данных не указан, показана вся параллель.</p>
+            </div>
+            """
+
+    with span("db_class_at_risk"):
+        at_risk = saves.get_class_at_risk(class_num, subject_idx)
+    names = [escape(login) if login else f"Ученик {student_id}" for student_id, grade, login in at_risk]
+    risk_items = "".join(f"<li>{name} — прогноз {grade}</li>" for name, (_, grade, _) in zip(names, at_risk))
+    risk_html = f"""
+            <ul class="student-list">{risk_items or "<li>Учеников в зоне риска нет</li>"}</ul>
+            <div class="risk-scale-numbers">
+                <span>2</span>
+                <span>3</span>
+                <span>4</span>
+                <span>5</span>
+            </div>
+            """
+    if names:
+        recommendations = f"""
+            <div class="recommendations">
+                Подтяните знания у следующих учеников:<br>
+                <strong>{", ".join(names)}</strong>
+            </div>
+            """
     else:
-        return "Нет предметов с низкими оценками (2 или 3)."
+        recommendations = """<div class="recommendations">Все ученики на 4 и 5</div>"""
+    return [stats_html, risk_html, recommendations]
 
 
-def calculate_average_grade(prediction):
-    """Вычисляет среднюю оценку."""
-    return round(sum(prediction) / len(prediction), 2)
+def class_decline(class_num, limit=10):
+    """Ученики класса с самым сильным снижением средней оценки за последний год."""
+    with span("trend_decline"):
+        declining = trend_index.get().decline(int(class_num), limit)
+    with span("db_logins"):
+        logins = SavesDataStudents().get_logins([student_id for student_id, _, _ in declining])
+    items = "".join(
+        f"<li>{escape(logins.get(student_id) or f'Ученик {student_id}')} — {slope:+.3f} за четверть, "
+        f"средняя {average:.2f}</li>"
+        for student_id, slope, average in declining)
+    return f"""<ul class="student-list">{items or "<li>Снижения успеваемости нет</li>"}</ul>"""
 
 
-class_chart = create_class_chart()
+@track("analyze_class")
+async def analyze_class(token, subject_name, class_num, class_letter):
+    session = sessions.get(token)
+    if session is None or session.type not in STAFF_TYPES:
+        raise gr.Error("Анализ класса доступен учителям, войдите снова")
+    dashboard = await run_db(class_dashboard, subject_name, class_num, class_letter)
+    return [*dashboard, await run_db(class_decline, class_num)]
+
 
 custom_css = """
 /* (Ваши существующие CSS стили остаются без изменений) */
@@ -397,6 +556,9 @@ footer {
     display: none !important;
 }
 """
+# Браузер загружает стили один раз по адресу с хэшем, а не в конфигурации каждой страницы
+STYLE_URL = assets.add("style", custom_css, "css", pinned=True)
+
 # with open("password.png", "rb") as image_file:
 #     base64_str = base64.b64encode(image_file.read()).decode('utf-8')
 # custom_css_base64 = f"""
@@ -456,83 +618,180 @@ def show_teacher():
     ]
 
 
-def check_user(login, password):
-    users_db = SavesDataUsers().get_data_user()
-    for user in users_db:
-        if users_db[user]["login"] == login and users_db[user]["password"] == password:
-            if users_db[user]["type"] == "student":
-                student_data = SavesDataStudents().get_data_student(user)
-                student_id = student_data['student_id']
-                class_num = 9
-                try:
-                    student_data = get_student_class_data(student_id, class_num)
-                    prediction = model.predict(student_data)
-                    print("Сырые предсказания модели:", prediction)  # Добавлено
-
-                    prediction = prediction[:9] if len(prediction) >= 9 else prediction.tolist() + [3] * (
-                                9 - len(prediction))
-                    print("Обработанные оценки:", prediction)  # Добавлено
-
-                    risk_fig = create_risk_chart(prediction)
-                    recommendations = get_recommendations(prediction)
-                    avg_grade = calculate_average_grade(prediction)
-                    grades_html = generate_grades_html(prediction)
-
-                    return [
-                        *show_student(),
-                        risk_fig,  # Возвращаем figure вместо base64
-                        recommendations,
-                        f"{avg_grade:.2f}",
-                        prediction,
-                        grades_html
-                    ]
-                except Exception as e:
-                    raise gr.Error(f"Ошибка при анализе данных: {str(e)}")
-            elif users_db[user]["type"] in ["teacher", "class_teacher", "director"]:
-                return show_teacher()
+def student_trend_html(student_id):
+    """График средней оценки ученика по четвертям 8–11 классов и вывод о последнем годе."""
+    with span("trend"):
+        series = trend_index.get().series(student_id) if student_id is not None else None
+    if series is None:
+        return "<p>Нет данных об оценках по четвертям.</p>"
+    labels = [f"{class_num}.{period}" for class_num, period in
+              zip(series['classes'].tolist(), series['periods'].tolist())]
+    chart = render_trend_chart(labels, series['averages'].tolist(), series['rolling'].tolist())
+    return f"""<div class="risk-chart-container">{chart}</div>
+    <p>За последние четверти средняя оценка {describe_slope(series['slopes'][-1])}.</p>"""
+
+
+def build_student_view(prediction, student_id=None):
+    """График, рекомендации, средняя оценка, таблица и динамика по четвертям для страницы ученика."""
+    result = analyze([prediction])
+    return [
+        create_risk_chart(prediction),
+        result.recommendations[0],
+        f"{result.averages[0]:.2f}",
+        prediction,
+        generate_grades_html(prediction),
+        student_trend_html(student_id)
+    ]
+
+
+def find_user(login):
+    with span("db_user"):
+        return SavesDataUsers(cache=user_cache).get_user_by_login(login)
+
+
+def find_student(user_id):
+    with span("db_student"):
+        return SavesDataStudents().get_data_student(user_id)
+
+
+NO_STUDENT_VIEW = [gr.update()] * 6
+
+
+async def student_prediction(session, class_num):
+    """Оценки ученика из сессии; если их нет или сменилась модель — расчет и запись в сессию."""
+    version = await run_db(model_version.get)
+    prediction = session.get_prediction(class_num, version)
+    if prediction is None:
+        prediction = await predict_grades_async(session.student_id, class_num)
+        # Гарантируем 9 элементов, заменяем None на 3 (средняя оценка)
+        prediction = grade_matrix([prediction])[0].tolist()
+        sessions.save_prediction(session, class_num, version, prediction)
+    logger.debug("Оценки для страницы: %s", prediction)
+    return prediction
+
+
+def upgrade_password(user_id, password):
+    """Заменяет старый пароль открытым текстом (или хэш со старыми параметрами) на новый хэш."""
+    SavesDataUsers(cache=user_cache).save_data_user_password(user_id, auth.hash_password(password))
+
+
+async def authenticate(login, password, request):
+    """Пользователь при верном пароле, иначе None; пароль проверяется в пуле auth."""
+    client_ip = request.client.host if request is not None and request.client is not None else None
+    if not login_limiter.allow(login) or not ip_limiter.allow(client_ip):
+        raise gr.Error("Слишком много попыток входа, попробуйте позже")
+    user_data = await run_db(find_user, login)
+    with span("password_verify"):
+        if user_data is None:
+            await run_auth(auth.verify_unknown, password)
+            return None
+        if not await run_auth(auth.verify_password, password, user_data["password"]):
+            return None
+    if auth.needs_upgrade(user_data["password"]):
+        executors.submit_auth(upgrade_password, user_data["user_id"], password)
+    return user_data
+
+
+@track("check_user")
+async def check_user(token, login, password, request: gr.Request):
+    user_data = await authenticate(login, password, request)
+    if user_data is not None:
+        sessions.delete(token)
+        user = user_data["user_id"]
+        if user_data["type"] == "student":
+            student_data = await run_db(find_student, user)
+            if student_data is None:
+                raise gr.Error("Ученик не найден")
+            session = Session(user, login, "student", student_data['student_id'], class_num=9)
+            try:
+                prediction = await student_prediction(session, session.class_num)
+                view = await run_cpu(build_student_view, prediction, session.student_id)
+            except Exception as e:
+                raise gr.Error(f"Ошибка при анализе данных: {str(e)}")
+            return [*show_student(), sessions.create(session), *view, session.class_num]
+        elif user_data["type"] in STAFF_TYPES:
+            token = sessions.create(Session(user, login, user_data["type"]))
+            return [*show_teacher(), token, *NO_STUDENT_VIEW, gr.update()]
     raise gr.Error("Неверный логин или пароль")
 
 
+async def open_session(token, fallback):
+    """Страница пользователя по токену сессии с уже посчитанными оценками или fallback."""
+    session = sessions.get(token)
+    if session is not None and session.type == "student":
+        try:
+            prediction = await student_prediction(session, session.class_num)
+            return [*show_student(), *await run_cpu(build_student_view, prediction, session.student_id), session.class_num]
+        except Exception as e:
+            logger.warning("Не удалось открыть сессию ученика %s: %s", session.student_id, e)
+    elif session is not None:
+        return [*show_teacher(), *NO_STUDENT_VIEW, gr.update()]
+    return [*fallback(), *NO_STUDENT_VIEW, gr.update()]
+
+
+async def resume_session(token):
+    """Кнопка «Начать работу»: вошедший пользователь сразу попадает на свою страницу."""
+    return await open_session(token, show_entry)
+
+
+async def restore_session(token):
+    """Открытие вкладки заново: страница пользователя, если сессия еще жива."""
+    return await open_session(token, show_home)
+
+
+def logout(token):
+    sessions.delete(token)
+    return [*show_home(), ""]
+
+
 def send_recovery(email_or_phone):
     return show_entry()
 
 
-def analyze_student(student_id, class_num):
+@track("analyze_student")
+async def analyze_student(token, class_num):
+    session = sessions.get(token)
+    if session is None or session.student_id is None:
+        raise gr.Error("Сессия истекла, войдите снова")
     try:
-        prediction = predict_grades(student_id, class_num)
-
-        # Гарантируем 9 элементов, заменяем None на 3 (средняя оценка)
-        prediction = [x if x is not None else 3 for x in prediction]
-        prediction = (prediction + [3] * 9)[:9]  # Заполняем недостающие
-
-        print("Предсказанные оценки:", prediction)  # Для отладки
-
-        risk_fig = create_risk_chart(prediction)
-        recommendations = get_recommendations(prediction)
-        avg_grade = calculate_average_grade(prediction)
-        grades_html = generate_grades_html(prediction)
-
-        return [
-            risk_fig,
-            recommendations,
-            f"{avg_grade:.2f}",
-            prediction,
-            grades_html
-        ]
+        prediction = await student_prediction(session, int(class_num))
+        return await run_cpu(build_student_view, prediction, session.student_id)
     except Exception as e:
-        print(f"Ошибка: {str(e)}")
+        logger.warning("Ошибка анализа ученика %s: %s", session.student_id, e)
         raise gr.Error(f"Ошибка анализа: {str(e)}")
 
+def build_report(class_num, fmt):
+    active = models.get().active()
+    return export.export_to_dir(grades.get().index, active.model, class_num, fmt,
+                                logins=SavesDataStudents().get_logins)
+
+
+@track("export_report")
+async def export_report(token, class_num, whole_school, fmt):
+    """Файл отчета по классу или всей школе для скачивания (gr.File)."""
+    session = sessions.get(token)
+    if session is None or session.type not in STAFF_TYPES:
+        raise gr.Error("Выгрузка доступна учителям, войдите снова")
+    class_num = None if whole_school else int(class_num)
+    try:
+        path, count = await run_export(build_report, class_num, fmt.lower())
+    except RuntimeError as e:
+        raise gr.Error(str(e))
+    if not count:
+        raise gr.Error("Нет данных для выгрузки по школе" if class_num is None
+                       else f"Нет данных для {class_num} класса")
+    logger.info("Выгрузка %s: %d строк, %s", session.login, count, path.name)
+    return str(path)
+
+
 def generate_grades_html(prediction):
     # Гарантируем 9 элементов
-    prediction = (prediction + [0] * 9)[:9]
+    prediction = grade_matrix([prediction])[0].tolist()
+    with span("html_build"):
+        return render_cache.get_or_render("grades", prediction, _render_grades_html)
 
-    subjects = [
-        "Вероятность и статистика", "Геометрия", "Обществознание",
-        "Русский язык", "Современная литература", "Труд",
-        "Физ-ра", "Физика", "Химия"  # Исправлено с "Хэ" на "Химия"
-    ]
 
+def _render_grades_html(prediction):
     headers = "".join(f"<th>{subj}</th>" for subj in subjects)
     values = "".join(f"<td>{grade}</td>" for grade in prediction)
 
@@ -543,9 +802,11 @@ def generate_grades_html(prediction):
     </table>
     """
 
-with gr.Blocks(css=custom_css, theme=gr.themes.Base()) as demo:
+with gr.Blocks(theme=gr.themes.Base()) as demo:
     # Скрытые элементы для хранения данных
     current_prediction = gr.State([])
+    # токен сессии: переживает перезагрузку и повторное открытие вкладки
+    session_token = gr.BrowserState("", storage_key="session")
 
     with gr.Column(visible=True, elem_classes=["main-container"]) as home_page:
         gr.Markdown("""
@@ -614,12 +875,14 @@ with gr.Blocks(css=custom_css, theme=gr.themes.Base()) as demo:
             """)
             gr.Markdown("""<div class="profile-divider"></div>""")
 
-
-        class_chart = create_class_chart()
+        with gr.Column(elem_classes="profile-section"):
+            gr.Markdown("### Динамика успеваемости")
+            trend_chart = gr.HTML()
+            gr.Markdown("""<div class="profile-divider"></div>""")
 
         with gr.Column(elem_classes="profile-section"):
             gr.Markdown("### Риски")
-            risk_chart = gr.Plot(label="График рисков успеваемости")  # Используем Plot вместо HTML
+            risk_chart = gr.HTML(label="График рисков успеваемости")
             gr.Markdown("""
             **Шкала уровней риска:**
             - 1-2: Низкий риск
@@ -634,6 +897,7 @@ with gr.Blocks(css=custom_css, theme=gr.themes.Base()) as demo:
                 """<div class="recommendations">Нажмите "Проанализировать" для получения рекомендаций</div>""")
 
         back_to_main_btn = gr.Button("Назад", elem_classes="back-button")
+        logout_btn = gr.Button("Выйти", elem_classes="back-button")
 
     with gr.Column(visible=False, elem_classes=["class-teacher-container"]) as teacher_page:
         gr.Markdown("""<div class="class-teacher-title">Информация о классе</div>""")
@@ -651,76 +915,147 @@ with gr.Blocks(css=custom_css, theme=gr.themes.Base()) as demo:
 
         with gr.Column(elem_classes="stats-container"):
             gr.Markdown("### Статистика по классу")
-            gr.HTML(f"""
-            <div>
-                <img src="{class_chart}" style="width: 100%; max-width: 500px; margin: 0 auto; display: block;">
-                <ul style="margin-top: 20px;">
-                    <li><strong>8 - Отлично</strong></li>
-                    <li><strong>9 - Хорошо</strong></li>
-                    <li><strong>10 - Удовлетворительно</strong></li>
-                    <li><strong>5 - Неудовлетворительно</strong></li>
-                </ul>
-                <p>Средняя оценка по классу: <strong>Хорошо - 4</strong></p>
-            </div>
-            """)
+            class_stats = gr.HTML("""<p>Выберите предмет и класс и нажмите «Проанализировать».</p>""")
             gr.Markdown("""<div class="profile-divider"></div>""")
 
         with gr.Column():
             gr.Markdown("### Риски")
-            gr.HTML("""
-            <ul class="student-list">
-                <li>Иванов И.О.</li>
-                <li>Воронкова Н.П.</li>
-                <li>Яблочкин Е.Б.</li>
-                <li>Галаниев Л.А.</li>
-                <li>Чемяленко А.А.</li>
-                <li>Виноградова В.С.</li>
-                <li>Бананов А.К.</li>
-                <li>Ананасова Е.М.</li>
-            </ul>
-            <div class="risk-scale-numbers">
-                <span>2</span>
-                <span>3</span>
-                <span>4</span>
-                <span>5</span>
-            </div>
-            """)
+            class_risks = gr.HTML()
             gr.Markdown("""<div class="profile-divider"></div>""")
 
         with gr.Column():
             gr.Markdown("### Рекомендации")
-            gr.Markdown("""
-            <div class="recommendations">
-                Подтяните знания у следующих учеников:<br>
-                <strong>Иванов И.О., Воронкова Н.П., Яблочкин Е.Б., Галаниев Л.А., Чемяленко А.А.</strong>
-            </div>
-            """)
+            class_recommendations = gr.Markdown(
+                """<div class="recommendations">Нажмите "Проанализировать" для получения рекомендаций</div>""")
+            gr.Markdown("""<div class="profile-divider"></div>""")
+
+        with gr.Column():
+            gr.Markdown("### Снижение успеваемости")
+            gr.Markdown("Ученики, у которых средняя оценка за последние четверти этого класса падает быстрее всех.")
+            class_decline_list = gr.HTML()
+
+        with gr.Column():
+            gr.Markdown("### Выгрузка прогнозов")
+            gr.Markdown("Прогноз, уровни риска и рекомендации по каждому ученику выбранного класса или всей школы.")
+            with gr.Row():
+                export_whole_school = gr.Checkbox(label="Вся школа", value=False)
+                export_format = gr.Radio([fmt.upper() for fmt in export.available_formats()], value="CSV",
+                                         label="Формат")
+            export_btn = gr.Button("Выгрузить", elem_classes="analyze-button")
+            export_file = gr.File(label="Отчет", interactive=False)
+            gr.Markdown("""<div class="profile-divider"></div>""")
 
         back_btn_teacher = gr.Button("Назад", elem_classes="back-button")
+        logout_btn_teacher = gr.Button("Выйти", elem_classes="back-button")
 
     # Обработчики событий
-    start_btn.click(show_entry, outputs=[home_page, entry_page, recovery_page, student_page, teacher_page])
-    login_btn.click(check_user, inputs=[login_input, password_input],
-                    outputs=[home_page, entry_page, recovery_page, student_page, teacher_page])
-    recovery_btn_link.click(show_recovery, outputs=[home_page, entry_page, recovery_page, student_page, teacher_page])
-    recovery_btn.click(send_recovery, inputs=[recovery_input],
-                       outputs=[home_page, entry_page, recovery_page, student_page, teacher_page])
-    back_btn.click(show_entry, outputs=[home_page, entry_page, recovery_page, student_page, teacher_page])
-    back_to_main_btn.click(show_home, outputs=[home_page, entry_page, recovery_page, student_page, teacher_page])
-    back_btn_teacher.click(show_entry, outputs=[home_page, entry_page, recovery_page, student_page, teacher_page])
+    pages = [home_page, entry_page, recovery_page, student_page, teacher_page]
+    student_view = [risk_chart, recommendations_output, avg_grade_output, current_prediction, grades_table, trend_chart]
+    # вошедший пользователь попадает на свою страницу с уже посчитанными оценками
+    start_btn.click(resume_session, inputs=[session_token], outputs=[*pages, *student_view, class_num_input],
+                    concurrency_limit=executors.LOGIN_CONCURRENCY, concurrency_id="login")
+    demo.load(restore_session, inputs=[session_token], outputs=[*pages, *student_view, class_num_input],
+              concurrency_limit=executors.LOGIN_CONCURRENCY, concurrency_id="login")
+    login_btn.click(check_user, inputs=[session_token, login_input, password_input],
+                    outputs=[*pages, session_token, *student_view, class_num_input],
+                    concurrency_limit=executors.LOGIN_CONCURRENCY, concurrency_id="login")
+    recovery_btn_link.click(show_recovery, outputs=pages)
+    recovery_btn.click(send_recovery, inputs=[recovery_input], outputs=pages)
+    back_btn.click(show_entry, outputs=pages)
+    back_to_main_btn.click(show_home, outputs=pages)
+    back_btn_teacher.click(show_entry, outputs=pages)
+    logout_btn.click(logout, inputs=[session_token], outputs=[*pages, session_token])
+    logout_btn_teacher.click(logout, inputs=[session_token], outputs=[*pages, session_token])
+
+    analyze_btn_teacher.click(
+        fn=analyze_class,
+        inputs=[session_token, subject, class_num, class_letter],
+        outputs=[class_stats, class_risks, class_recommendations, class_decline_list],
+        concurrency_limit=executors.ANALYZE_CONCURRENCY,
+        concurrency_id="analyze"
+    )
+
+    export_btn.click(
+        fn=export_report,
+        inputs=[session_token, class_num, export_whole_school, export_format],
+        outputs=export_file,
+        concurrency_limit=executors.EXPORT_WORKERS,
+        concurrency_id="export"
+    )
 
     analyze_btn.click(
         fn=analyze_student,
-        inputs=[gr.State(1), class_num_input],
-        outputs=[
-            risk_chart,
-            recommendations_output,
-            avg_grade_output,
-            current_prediction,
-            grades_table
-        ]
+        inputs=[session_token, class_num_input],
+        outputs=student_view,
+        concurrency_limit=executors.ANALYZE_CONCURRENCY,
+        concurrency_id="analyze"
     )
 
-    demo.launch(server_name="0.0.0.0", server_port=8000)
+    demo.queue(max_size=executors.QUEUE_SIZE, default_concurrency_limit=executors.DEFAULT_CONCURRENCY)
+startup.mark("build UI")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сайт прогнозирования успеваемости")
+    parser.add_argument("--eager", action="store_true",
+                        help="загрузить данные и модель до запуска сервера")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="не прогревать ресурсы в фоне, загружать по первому запросу")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="вывести длительность фаз запуска после прогрева")
+    parser.add_argument("--watch-dir", type=Path,
+                        help="каталог, из которого новые CSV с оценками дописываются в data.csv")
+    parser.add_argument("--db-workers", type=int, help="потоков для запросов к БД")
+    parser.add_argument("--inference-workers", type=int, help="потоков для модели и графиков")
+    parser.add_argument("--inference-processes", type=int,
+                        help="процессов для расчета модели (0 — считать в потоках); "
+                             "данные и модель загружаются до запуска и делятся между процессами")
+    parser.add_argument("--log-level", default=os.environ.get("LOG_LEVEL", "WARNING"),
+                        help="уровень журнала: DEBUG выводит время этапов и оценки")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    executors.configure(args.db_workers, args.inference_workers, args.inference_processes)
+
+    init_storage()
+    startup.mark("init storage")
+    if args.eager or executors.INFERENCE_PROCESSES > 0:
+        warm_up((grades, models, trend_index), background=False)
+        startup.mark("eager load")
+    if executors.INFERENCE_PROCESSES > 0:
+        # fork до запуска сервера: ресурсы уже в памяти, потоков сервера еще нет
+        executors.start_processes()
+        startup.mark("start inference processes")
+
+    from starlette.middleware import Middleware
+
+    server_app, _, _ = demo.launch(server_name="0.0.0.0", server_port=8000, prevent_thread_lock=True,
+                                   head=f'<link rel="stylesheet" href="{STYLE_URL}">',
+                                   app_kwargs={"middleware": [Middleware(PageCompression)]})
+    # метрики в формате Prometheus рядом с сайтом: GET /metrics
+    metrics.add_route(server_app)
+    # стили и графики классов: GET /site/<имя>.<хэш>.<расширение>
+    static_assets.add_route(server_app, assets)
+    startup.mark("launch server")
+
+    if args.watch_dir:
+        import ingest
+        threading.Thread(target=ingest.watch, args=(args.watch_dir, DATA_PATH),
+                         name="ingest", daemon=True).start()
+
+    warm_thread = None
+    if not grades.loaded and not args.no_warmup:
+        warm_thread = warm_up((grades, models, trend_index))
+    if args.startup_report:
+        if warm_thread is not None:
+            warm_thread.join()
+        print(startup.report())
+    try:
+        demo.block_thread()
+    finally:
+        executors.shutdown()
 
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Пароли пользователей и ограничение частоты попыток входа.
+
+Пароли хранятся в site_user.password как соленый хэш scrypt:
+
+    scrypt$<n>$<r>$<p>$<соль base64>$<хэш base64>
+
+Старые пароли открытым текстом по-прежнему принимаются и заменяются
+хэшем при первом успешном входе; всю базу сразу можно перевести командой
+
+    python auth.py migrate [--db website_data.db]
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from data_base import DB_PATH
+
+# Параметры scrypt: около 16 МБ памяти и десятков мс на одну проверку
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+HASH_BYTES = 32
+PREFIX = 'scrypt'
+
+# Попытки входа: на логин 5 подряд, дальше одна в 5 с; на IP 60 подряд, дальше 5 в секунду.
+# Ученики школы могут выходить в сеть с одного адреса, поэтому лимит на IP выше. 0 — без ограничения.
+LOGIN_RATE = float(os.environ.get("LOGIN_RATE", 0.2))
+LOGIN_BURST = float(os.environ.get("LOGIN_BURST", 5))
+IP_RATE = float(os.environ.get("LOGIN_IP_RATE", 5))
+IP_BURST = float(os.environ.get("LOGIN_IP_BURST", 60))
+
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def _scrypt(password, salt, n, r, p, dklen):
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                          maxmem=128 * r * (n + p + 2), dklen=dklen)
+
+
+def hash_password(password):
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P, HASH_BYTES)
+    return f"{PREFIX}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+
+def is_hashed(stored):
+    return isinstance(stored, str) and stored.startswith(PREFIX + '$')
+
+
+def verify_password(password, stored):
+    """Проверяет пароль по записи из site_user (хэш или старый открытый текст)."""
+    if stored is None:
+        return False
+    if not is_hashed(stored):
+        return hmac.compare_digest(str(password).encode('utf-8'), str(stored).encode('utf-8'))
+    try:
+        _, n, r, p, salt, digest = stored.split('$')
+        digest = base64.b64decode(digest)
+        actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p), len(digest))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, digest)
+
+
+# Хэш для проверки несуществующих логинов: ответ занимает столько же времени,
+# и по нему нельзя узнать, есть ли такой пользователь
+_DUMMY_HASH = None
+
+
+def verify_unknown(password):
+    global _DUMMY_HASH
+    if _DUMMY_HASH is None:
+        _DUMMY_HASH = hash_password(secrets.token_hex(8))
+    verify_password(password, _DUMMY_HASH)
+    return False
+
+
+def needs_upgrade(stored):
+    """True для открытого текста и хэшей со старыми параметрами."""
+    if not is_hashed(stored):
+        return True
+    return stored.split('$')[1:4] != [str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+
+
+class RateLimiter:
+    """Корзина токенов на ключ (логин, IP): burst попыток сразу, дальше rate в секунду.
+
+    Проверка — словарь и арифметика под блокировкой, без обращения к БД.
+    Ключей не больше max_keys, давно не использованные вытесняются.
+    rate <= 0 отключает ограничение.
+    """
+
+    def __init__(self, rate, burst, max_keys=100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def allow(self, key):
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self.rejected += 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
+
+    def stats(self):
+        with self._lock:
+            return {'keys': len(self._buckets), 'rejected': self.rejected}
+
+
+def migrate(db_path):
+    """Заменяет пароли открытым текстом в site_user на хэши. Возвращает число измененных."""
+    import sqlite3
+
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute('SELECT user_id, password FROM site_user').fetchall()
+        updates = [(hash_password(str(password)), user_id)
+                   for user_id, password in rows if password is not None and not is_hashed(password)]
+        with conn:
+            conn.executemany('UPDATE site_user SET password = ? WHERE user_id = ?', updates)
+    finally:
+        conn.close()
+    return len(updates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пароли пользователей сайта")
+    parser.add_argument('command', choices=['migrate'])
+    parser.add_argument('--db', type=Path, default=DB_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = migrate(args.db)
+    print(f"Паролей переведено в scrypt: {count} за {time.perf_counter() - start:.1f} с")
+
+
+if __name__ == '__main__':
+    main()
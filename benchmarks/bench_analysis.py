@@ -0,0 +1,86 @@
+"""Рекомендации, средние и цвета рисков: циклы по ученикам против analysis.analyze.
+
+Прежний код страницы ученика вызывается для каждого вектора оценок по
+очереди; analysis.analyze считает все векторы одним проходом NumPy.
+Перед замером проверяется, что результаты совпадают.
+
+Запуск: python benchmarks/bench_analysis.py [--students 1 100 10000 100000] [--json results/analysis.json]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analysis import SUBJECTS, analyze
+from report import print_table, save_json, summarize
+
+
+def risk_color(level):
+    if level >= 4:
+        return '#ff5252'
+    elif level >= 3:
+        return '#ffb74d'
+    return '#66bb6a'
+
+
+def analyze_loop(predictions):
+    """Прежний расчет: списки Python для каждого ученика."""
+    results = []
+    for prediction in predictions:
+        prediction = ([x if x is not None else 3 for x in prediction] + [3] * 9)[:9]
+        risk_subjects = [subject for subject, grade in zip(SUBJECTS, prediction) if grade in (2, 3)]
+        if risk_subjects:
+            if len(risk_subjects) == 1:
+                text = f"Подтяните знания в следующем предмете: {risk_subjects[0]}"
+            else:
+                text = "Подтяните знания в следующих предметах: " + ", ".join(risk_subjects)
+        else:
+            text = "Нет предметов с низкими оценками (2 или 3)."
+        levels = [5 - grade + 1 for grade in prediction]
+        results.append((text, round(sum(prediction) / len(prediction), 2), [risk_color(level) for level in levels]))
+    return results
+
+
+def measure(fn, arg, repeats):
+    fn(arg)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--students', type=int, nargs='+', default=[1, 100, 10000, 100000])
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--json', type=Path, help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = {}
+    for n in args.students:
+        array = rng.integers(2, 6, size=(n, len(SUBJECTS)))
+        lists = array.tolist()
+        result = analyze(array)
+        expected = analyze_loop(lists)
+        if (list(result.recommendations) != [item[0] for item in expected]
+                or result.averages.tolist() != [item[1] for item in expected]
+                or result.colors.tolist() != [item[2] for item in expected]):
+            raise SystemExit(f"Результаты расходятся на {n} учениках")
+        repeats = max(3, args.repeats // max(1, n // 10000))
+        results[f'loop/{n}'] = measure(analyze_loop, lists, repeats)
+        results[f'analyze_lists/{n}'] = measure(analyze, lists, repeats)
+        results[f'analyze_array/{n}'] = measure(analyze, array, repeats)
+    print_table(results)
+    if args.json:
+        save_json(args.json, 'analysis', {'students': args.students, 'repeats': args.repeats}, results)
+
+
+if __name__ == '__main__':
+    main()
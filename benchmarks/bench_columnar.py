@@ -0,0 +1,86 @@
+"""Загрузка таблицы оценок: data.csv против колоночного формата (columnar.py).
+
+Для каждого размера создается синтетическая таблица, затем каждый вариант
+загружается в отдельном процессе: время до готового индекса и прирост RSS.
+Запуск: python benchmarks/bench_columnar.py [--sizes 1000 1000000 10000000]
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+def rss_mb():
+    """Текущий RSS (Linux); на других системах — пиковый."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_csv(path, n_rows, chunk_size=1_000_000):
+    from bench_grades_index import make_frame
+
+    for i, start in enumerate(range(0, n_rows, chunk_size)):
+        chunk = make_frame(min(chunk_size, n_rows - start), seed=i)
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+
+
+def measure(path):
+    """Загрузка в текущем процессе; вызывается в дочернем процессе."""
+    from grades_index import GradesStore
+
+    before = rss_mb()
+    start = time.perf_counter()
+    store = GradesStore(path)
+    elapsed = time.perf_counter() - start
+    # обращение ко всем строкам, как при пакетном расчете
+    store.frame.sum(numeric_only=True)
+    # для memory-map сюда входят страницы файла, общие для всех процессов
+    print(json.dumps({'load_s': elapsed, 'rss_mb': rss_mb() - before}))
+
+
+def run(path):
+    out = subprocess.run([sys.executable, __file__, '--measure', str(path)],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 1_000_000, 10_000_000])
+    parser.add_argument('--measure')
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure)
+        return
+
+    import columnar
+
+    print(f"{'rows':>9} {'csv load, s':>12} {'csv RSS, MB':>12} {'npy load, s':>12} {'npy RSS, MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in args.sizes:
+            csv_path = Path(tmp) / f'data_{n_rows}.csv'
+            npy_dir = Path(tmp) / f'data_{n_rows}'
+            write_csv(csv_path, n_rows)
+            columnar.convert(csv_path, npy_dir)
+            csv = run(csv_path)
+            npy = run(npy_dir)
+            print(f"{n_rows:>9} {csv['load_s']:>12.3f} {csv['rss_mb']:>12.1f} "
+                  f"{npy['load_s']:>12.3f} {npy['rss_mb']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
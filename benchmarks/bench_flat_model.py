@@ -0,0 +1,62 @@
+"""Время одного вызова модели: pipeline.predict против плоской NumPy-версии.
+
+Плоская модель замеряется на DataFrame (с переводом столбцов в массив) и на
+заранее заполненном float32-массиве. Перед замером проверяется, что
+предсказания совпадают.
+
+Запуск: python benchmarks/bench_flat_model.py [--batches 1 100 10000] [--json results/flat_model.json]
+"""
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_grades_index import make_frame
+from flat_model import FlatLinearModel
+from report import BASE_DIR, print_table, save_json, summarize
+
+warnings.filterwarnings("ignore")
+
+
+def measure(fn, arg, repeats):
+    fn(arg)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batches', type=int, nargs='+', default=[1, 100, 10000])
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--json', type=Path, help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    pipeline = joblib.load(BASE_DIR / 'model_1.pkl')
+    flat = FlatLinearModel.from_pipeline(pipeline)
+    results = {}
+    for batch in args.batches:
+        frame = make_frame(batch, seed=batch)
+        array = flat.features(frame)
+        if not np.array_equal(pipeline.predict(frame), flat.predict(array)):
+            raise SystemExit(f"Предсказания расходятся на пакете {batch}")
+        repeats = max(5, args.repeats // max(1, batch // 1000))
+        results[f'sklearn/{batch}'] = measure(pipeline.predict, frame, repeats)
+        results[f'flat_frame/{batch}'] = measure(flat.predict, frame, repeats)
+        results[f'flat_array/{batch}'] = measure(flat.predict, array, repeats)
+    print_table(results)
+    if args.json:
+        save_json(args.json, 'flat_model', {'batches': args.batches, 'repeats': args.repeats}, results)
+
+
+if __name__ == '__main__':
+    main()
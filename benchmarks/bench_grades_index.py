@@ -0,0 +1,69 @@
+"""Поиск строк ученика: фильтр по маскам против индекса (ученик, класс).
+
+Запуск: python benchmarks/bench_grades_index.py [--sizes 1000 100000 1000000]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from grades_index import StudentClassIndex
+
+
+def make_frame(n_rows, seed=0):
+    """Таблица в формате data.csv: около 14 строк на пару (ученик, класс)."""
+    rng = np.random.default_rng(seed)
+    n_students = max(1, n_rows // 56)
+    subjects = rng.dirichlet((1.0, 1.5, 1.2), size=n_rows)
+    return pd.DataFrame({
+        'Student': rng.integers(1, n_students + 1, n_rows),
+        'Period': rng.integers(1, 5, n_rows),
+        'Class': rng.integers(8, 12, n_rows),
+        'Is_new_sub': rng.integers(0, 2, n_rows),
+        'Average_grade': rng.uniform(2.5, 5.0, n_rows).round(2),
+        'Perform_trend': rng.integers(-2, 3, n_rows),
+        'Gender_М': rng.random(n_rows) < 0.5,
+        'Subject_3': subjects[:, 0],
+        'Subject_4': subjects[:, 1],
+        'Subject_5': subjects[:, 2],
+    })
+
+
+def timed(fn, keys):
+    times = []
+    for student_id, class_num in keys:
+        start = time.perf_counter()
+        fn(student_id, class_num)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'build, ms':>10} {'mask, us':>10} {'index, us':>10}")
+    for n_rows in args.sizes:
+        df = make_frame(n_rows)
+        sample = df.sample(args.lookups, replace=True, random_state=1)
+        keys = list(zip(sample['Student'], sample['Class']))
+
+        start = time.perf_counter()
+        index = StudentClassIndex(df)
+        build = (time.perf_counter() - start) * 1000
+
+        mask = timed(lambda s, c: df[(df['Student'] == s) & (df['Class'] == c)], keys)
+        indexed = timed(index.get, keys)
+        print(f"{n_rows:>9} {build:>10.1f} {mask:>10.1f} {indexed:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Замер времени входа: полный перебор site_user против запроса по индексу.
+
+Запуск: python benchmarks/bench_login.py [--sizes 1000 10000 100000]
+"""
+import argparse
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_base import SavesDataUsers, UserCache
+
+
+def make_db(path, n_users):
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE site_user (
+        user_id INTEGER NOT NULL PRIMARY KEY, login TEXT, password TEXT,
+        type TEXT, phone INTEGER, email TEXT)''')
+    # student нужна для индексов, которые создает Saves.create_indexes
+    conn.execute('''CREATE TABLE student (
+        student_id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER)''')
+    conn.executemany(
+        'INSERT INTO site_user VALUES (?, ?, ?, ?, ?, ?)',
+        ((i, f'user{i}', f'pass{i}', 'student', 89000000000 + i, f'user{i}@kuku.ru')
+         for i in range(1, n_users + 1)))
+    conn.executemany('INSERT INTO student VALUES (?, ?)', ((i, i) for i in range(1, n_users + 1)))
+    conn.commit()
+    conn.close()
+
+
+def scan_login(saves, login, password):
+    """Старый способ из check_user: все пользователи и перебор в Python."""
+    users_db = saves.get_data_user()
+    for user in users_db:
+        if users_db[user]["login"] == login and users_db[user]["password"] == password:
+            return users_db[user]
+    return None
+
+
+def indexed_login(saves, login, password):
+    user = saves.get_user_by_login(login)
+    if user is not None and user["password"] == password:
+        return user
+    return None
+
+
+def measure(fn, saves, n_users, repeats):
+    times = []
+    for k in range(repeats):
+        i = (k * 7919) % n_users + 1
+        start = time.perf_counter()
+        fn(saves, f'user{i}', f'pass{i}')
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeats', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'users':>8} {'scan, ms':>10} {'index, ms':>10} {'cache, ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_users in args.sizes:
+            path = Path(tmp) / f'users_{n_users}.db'
+            make_db(path, n_users)
+
+            saves = SavesDataUsers(path)
+            scan = measure(scan_login, saves, n_users, min(args.repeats, 10))
+            saves.create_indexes()
+            indexed = measure(indexed_login, saves, n_users, args.repeats)
+            cached_saves = SavesDataUsers(path, cache=UserCache(ttl=60.0))
+            measure(indexed_login, cached_saves, n_users, args.repeats)
+            cached = measure(indexed_login, cached_saves, n_users, args.repeats)
+            print(f"{n_users:>8} {scan:>10.3f} {indexed:>10.3f} {cached:>10.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Отрисовка графика рисков: matplotlib (прежний create_risk_chart) против SVG-шаблона.
+
+Каждый вариант запускается в отдельном процессе, чтобы RSS не смешивались.
+Запуск: python benchmarks/bench_risk_chart.py [--renders 10000]
+"""
+import argparse
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+subjects = [
+    "Вероятность и статистика", "Геометрия", "Обществознание",
+    "Русский язык", "Современная литература", "Труд",
+    "Физ-ра", "Физика", "Химия"
+]
+
+
+def matplotlib_chart(prediction):
+    """Прежняя реализация create_risk_chart и сериализация фигуры в PNG, как у gr.Plot."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    risk_levels = [5 - grade + 1 for grade in prediction]
+    fig, ax = plt.subplots(figsize=(10, 5))
+    colors = ['#ff5252' if level >= 4 else '#ffb74d' if level >= 3 else '#66bb6a' for level in risk_levels]
+    bars = ax.barh(subjects, risk_levels, color=colors, height=0.6)
+    for bar in bars:
+        width = bar.get_width()
+        ax.text(width + 0.1, bar.get_y() + bar.get_height() / 2, f'{width:.1f}',
+                ha='left', va='center', fontsize=10, fontweight='bold')
+    ax.set_xlim(0, 5)
+    ax.set_xticks(range(0, 6))
+    ax.set_xlabel('Уровень риска (1-5)', fontsize=12)
+    ax.set_title('Риски успеваемости по предметам', fontsize=14, pad=20)
+    plt.tight_layout()
+    fig.savefig(BytesIO(), format='png')
+    plt.close(fig)
+
+
+def svg_chart(prediction):
+    from charts import render_risk_chart
+    render_risk_chart(subjects, prediction)
+
+
+def run(renderer, renders):
+    fn = {'matplotlib': matplotlib_chart, 'svg': svg_chart}[renderer]
+    rng = random.Random(0)
+    times = []
+    for _ in range(renders):
+        prediction = [rng.randint(2, 5) for _ in subjects]
+        start = time.perf_counter()
+        fn(prediction)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    p50 = statistics.median(times) * 1000
+    p99 = times[int(len(times) * 0.99) - 1] * 1000
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{renderer:>10} {renders:>8} {p50:>9.3f} {p99:>9.3f} {rss:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--renders', type=int, default=10000)
+    parser.add_argument('--renderer', choices=['matplotlib', 'svg'])
+    args = parser.parse_args()
+
+    if args.renderer:
+        run(args.renderer, args.renders)
+        return
+
+    print(f"{'renderer':>10} {'renders':>8} {'p50, ms':>9} {'p99, ms':>9} {'max RSS, MB':>10}")
+    for renderer in ('matplotlib', 'svg'):
+        subprocess.run([sys.executable, __file__, '--renderer', renderer, '--renders', str(args.renders)],
+                       check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Замер отдельных этапов входа и анализа на синтетической школе.
+
+Этапы: поиск пользователя и ученика в БД, выборка строк ученика (маски и
+индекс), ключ кэша предсказаний, расчет модели, отрисовка графика и таблицы
+оценок. Для каждого — p50/p95/p99 в мс.
+
+Запуск: python benchmarks/bench_stages.py [--students 1000] [--json results/stages.json]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from report import BASE_DIR, print_table, save_json, summarize
+from school import make_school
+
+warnings.filterwarnings("ignore")
+
+
+def measure(fn, args_list):
+    times = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+def run(tmp, n_students, repeats, seed):
+    data_path, db_path = make_school(tmp, n_students, n_teachers=10, seed=seed)
+    # модули сайта читают пути при импорте
+    os.environ['WEBSITE_DB'] = str(db_path)
+    os.environ['GRADES_CSV'] = str(data_path)
+    from app import _render_grades_html, subjects
+    from charts import render_risk_chart
+    from data_base import SavesDataStudents, SavesDataUsers
+    from grades_index import GradesStore
+    from prediction_cache import PredictionCache
+
+    users = SavesDataUsers(db_path)
+    users.create_indexes()
+    students = SavesDataStudents(db_path)
+    store = GradesStore(data_path)
+    frame = store.frame
+    model = joblib.load(BASE_DIR / 'model_1.pkl')
+
+    rng = np.random.default_rng(seed)
+    keys = list(store.index.keys())
+    picked = [keys[i] for i in rng.integers(0, len(keys), repeats)]
+    logins = [(f'student{rng.integers(1, n_students + 1)}',) for _ in range(repeats)]
+    rows = [store.get(*key) for key in picked]
+    # уникальные векторы оценок, чтобы замерить отрисовку, а не кэш
+    vectors = [(list(rng.integers(2, 6, 9)),) for _ in range(repeats)]
+
+    results = {}
+    results['db_user_by_login'] = measure(users.get_user_by_login, logins)
+    results['db_student'] = measure(students.get_data_student,
+                                    [(int(rng.integers(1, n_students + 1)),) for _ in range(repeats)])
+    results['filter_mask'] = measure(
+        lambda s, c: frame[(frame['Student'] == s) & (frame['Class'] == c)], picked)
+    results['filter_index'] = measure(store.get, picked)
+    results['cache_key'] = measure(
+        lambda key, r: PredictionCache.make_key(key[0], key[1], r, 'bench'), list(zip(picked, rows)))
+    results['predict'] = measure(model.predict, [(r,) for r in rows])
+    results['chart_render'] = measure(lambda p: render_risk_chart(subjects, p), vectors)
+    results['html_render'] = measure(_render_grades_html, vectors)
+    return results, len(frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер этапов входа и анализа")
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--repeats', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', type=Path, help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results, n_rows = run(tmp, args.students, args.repeats, args.seed)
+    print(f"учеников: {args.students}, строк: {n_rows}")
+    print_table(results)
+    if args.json:
+        params = {'students': args.students, 'rows': n_rows, 'repeats': args.repeats, 'seed': args.seed}
+        save_json(args.json, 'stages', params, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Ряды успеваемости: фильтр DataFrame и polyfit по каждому ученику против trends.TrendStore.
+
+Прежний подход — выбрать строки ученика из таблицы, сгруппировать по
+четвертям и посчитать наклон np.polyfit; для списка снижения по классу —
+то же для каждого ученика. TrendStore строится один раз и отдает ряд
+ученика срезом, а список снижения — одним проходом по массивам.
+Перед замером проверяется, что наклоны совпадают.
+
+Запуск: python benchmarks/bench_trends.py [--sizes 10000 100000 1000000] [--json results/trends.json]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_grades_index import make_frame
+from report import print_table, save_json, summarize
+from trends import FIRST_CLASS, PERIODS, SLOPE_DECIMALS, STABLE_SLOPE, WINDOW, TrendStore
+
+CLASS_NUM = 9
+
+
+def student_series(frame, student_id):
+    """Прежний расчет ряда одного ученика: (шаги, средние) по четвертям."""
+    rows = frame[frame['Student'] == student_id]
+    points = rows.groupby(['Class', 'Period'], sort=True)['Average_grade'].first()
+    steps = np.array([(c - FIRST_CLASS) * PERIODS + p - 1 for c, p in points.index], dtype=np.float64)
+    return steps, points.to_numpy(dtype=np.float64), np.array([c for c, _ in points.index])
+
+
+def last_slope(steps, averages, classes, class_num):
+    last = np.flatnonzero(classes == class_num)
+    if not len(last):
+        return None
+    last = last[-1]
+    lo = max(0, last - WINDOW + 1)
+    if last == lo:
+        return 0.0
+    return float(np.polyfit(steps[lo:last + 1], averages[lo:last + 1], 1)[0])
+
+
+def decline_loop(frame, class_num, limit=10):
+    found = []
+    for student_id in np.unique(frame['Student']):
+        slope = last_slope(*student_series(frame, student_id), class_num)
+        if slope is not None and slope < -STABLE_SLOPE:
+            found.append((round(slope, SLOPE_DECIMALS), int(student_id)))
+    return sorted(found)[:limit]
+
+
+def measure(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+def build(frame):
+    return TrendStore(*(frame[name].to_numpy() for name in
+                        ('Student', 'Class', 'Period', 'Average_grade', 'Perform_trend')))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help="строк таблицы")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--json', type=Path, help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for n_rows in args.sizes:
+        frame = make_frame(n_rows)
+        # одна средняя на четверть, как в data.csv
+        frame['Average_grade'] = frame.groupby(['Student', 'Class', 'Period'])['Average_grade'].transform('first')
+        store = build(frame)
+        students = np.unique(frame['Student'])[:100]
+
+        expected = decline_loop(frame, CLASS_NUM)
+        got = [(slope, student_id) for student_id, slope, _ in store.decline(CLASS_NUM)]
+        if ([s for _, s in expected] != [s for _, s in got]
+                or not np.allclose([v for v, _ in expected], [v for v, _ in got])):
+            raise SystemExit(f"Списки снижения расходятся на {n_rows} строках")
+
+        repeats = max(1, args.repeats // max(1, n_rows // 100000))
+        results[f'series_loop/{n_rows}'] = measure(lambda: [student_series(frame, s) for s in students], repeats)
+        results[f'series_store/{n_rows}'] = measure(lambda: [store.series(s) for s in students], repeats)
+        results[f'decline_loop/{n_rows}'] = measure(lambda: decline_loop(frame, CLASS_NUM), 1)
+        results[f'store_build/{n_rows}'] = measure(lambda: build(frame), repeats)
+        results[f'decline_store/{n_rows}'] = measure(lambda: store.decline(CLASS_NUM), repeats)
+    print_table(results)
+    if args.json:
+        save_json(args.json, 'trends', {'sizes': args.sizes, 'repeats': args.repeats}, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Нагрузочный тест сайта: виртуальные пользователи входят и запускают анализ.
+
+Каждый пользователь в своем потоке повторяет сценарий вход (/check_user) →
+анализ (/analyze_student) через gradio_client. Итог — p50/p95/p99 задержек
+и запросов в секунду по каждому обработчику и по сценарию целиком.
+
+С --launch сайт запускается на синтетической школе (benchmarks/school.py):
+    python benchmarks/load_test.py --launch --students 2000 --users 16 --duration 60 --json results/load.json
+
+Без --launch нагружается уже запущенный сайт (--url); логины берутся из
+--school, по которому этот сайт запущен (WEBSITE_DB, GRADES_CSV).
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import pandas as pd
+from gradio_client import Client
+
+from report import BASE_DIR, print_table, save_json, summarize
+from school import make_school
+
+# check_user показывает прогноз за 9 класс
+CLASS_NUM = 9
+
+
+def wait_ready(url, process, timeout=180.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Сайт завершился с кодом {process.returncode}")
+        try:
+            if httpx.get(url, timeout=2.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Сайт не ответил за {timeout:.0f} с: {url}")
+
+
+def launch(school_dir, extra_args):
+    env = dict(os.environ, WEBSITE_DB=str(school_dir / 'website_data.db'),
+               GRADES_CSV=str(school_dir / 'data.csv'))
+    # все виртуальные пользователи идут с одного адреса: ограничение попыток входа выключено
+    env.setdefault('LOGIN_RATE', '0')
+    env.setdefault('LOGIN_IP_RATE', '0')
+    return subprocess.Popen([sys.executable, str(BASE_DIR / 'app.py'), '--eager', *extra_args],
+                            cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL)
+
+
+def student_logins(school_dir):
+    """Логины учеников, у которых есть строки за CLASS_NUM (иначе вход вернет ошибку)."""
+    frame = pd.read_csv(school_dir / 'data.csv', usecols=['Student', 'Class'])
+    students = sorted(frame.loc[frame['Class'] == CLASS_NUM, 'Student'].unique())
+    return [(f'student{s}', f'pass{s}') for s in students]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.times = {}
+        self.errors = {}
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.times.setdefault(name, []).append(seconds)
+
+    def error(self, name, e):
+        with self._lock:
+            self.errors.setdefault(name, {})
+            key = type(e).__name__
+            self.errors[name][key] = self.errors[name].get(key, 0) + 1
+
+
+def virtual_user(url, logins, deadline, recorder, seed):
+    rng = random.Random(seed)
+    client = Client(url, verbose=False)
+    while time.monotonic() < deadline:
+        login, password = rng.choice(logins)
+        flow_start = time.perf_counter()
+        try:
+            start = time.perf_counter()
+            token = client.predict("", login, password, api_name="/check_user")[0]
+            recorder.add('check_user', time.perf_counter() - start)
+        except Exception as e:
+            recorder.error('check_user', e)
+            continue
+        try:
+            start = time.perf_counter()
+            client.predict(token, CLASS_NUM, api_name="/analyze_student")
+            recorder.add('analyze_student', time.perf_counter() - start)
+        except Exception as e:
+            recorder.error('analyze_student', e)
+            continue
+        recorder.add('login_analyze_flow', time.perf_counter() - flow_start)
+
+
+def run_load(url, logins, n_users, duration, seed):
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=virtual_user, args=(url, logins, deadline, recorder, seed + i))
+               for i in range(n_users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    results = {name: summarize(times, elapsed) for name, times in recorder.times.items()}
+    return results, recorder.errors, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест входа и анализа")
+    parser.add_argument('--url', default='http://127.0.0.1:8000/')
+    parser.add_argument('--launch', action='store_true', help="запустить сайт на синтетической школе")
+    parser.add_argument('--app-args', default='', help="доп. аргументы app.py, например '--inference-processes 4'")
+    parser.add_argument('--school', type=Path, help="каталог школы (создается, если его нет)")
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--teachers', type=int, default=50)
+    parser.add_argument('--rows-per-student', type=int)
+    parser.add_argument('--users', type=int, default=8, help="одновременных пользователей")
+    parser.add_argument('--duration', type=float, default=30.0, help="секунд нагрузки")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', type=Path, help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        school_dir = args.school or Path(tmp) / 'school'
+        if not (school_dir / 'data.csv').exists():
+            make_school(school_dir, args.students, args.teachers, args.rows_per_student, args.seed)
+        logins = student_logins(school_dir)
+
+        process = launch(school_dir, args.app_args.split()) if args.launch else None
+        try:
+            wait_ready(args.url, process)
+            # прогрев: первое обращение открывает соединения и заполняет кэши
+            run_load(args.url, logins, 1, 2.0, args.seed)
+            results, errors, elapsed = run_load(args.url, logins, args.users, args.duration, args.seed)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+
+    print(f"пользователей: {args.users}, {elapsed:.1f} с, учеников с логином: {len(logins)}")
+    print_table(results)
+    if errors:
+        print("ошибки:", errors)
+    if args.json:
+        params = {key: (str(value) if isinstance(value, Path) else value) for key, value in vars(args).items()}
+        save_json(args.json, 'load', params, {'endpoints': results, 'errors': errors, 'elapsed_s': round(elapsed, 2)})
+
+
+if __name__ == '__main__':
+    main()
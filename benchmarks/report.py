@@ -0,0 +1,66 @@
+"""Общие функции для замеров: перцентили задержек и сохранение результатов в JSON.
+
+JSON с коммитом и параметрами запуска можно сравнивать между версиями:
+    python benchmarks/bench_stages.py --json results/stages_$(git rev-parse --short HEAD).json
+"""
+import json
+import platform
+import subprocess
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def summarize(times, elapsed=None):
+    """Задержки в мс (p50/p95/p99, среднее, максимум) и запросов в секунду."""
+    ms = np.asarray(times, dtype=float) * 1000
+    if not len(ms):
+        return {'count': 0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    result = {
+        'count': len(ms),
+        'p50_ms': round(float(p50), 4),
+        'p95_ms': round(float(p95), 4),
+        'p99_ms': round(float(p99), 4),
+        'mean_ms': round(float(ms.mean()), 4),
+        'max_ms': round(float(ms.max()), 4),
+    }
+    if elapsed:
+        result['rps'] = round(len(ms) / elapsed, 2)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_json(path, benchmark, params, results):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        'benchmark': benchmark,
+        'commit': git_commit(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'params': params,
+        'results': results,
+    }
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8')
+
+
+def print_table(results):
+    print(f"{'этап':<24} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'req/s':>9}")
+    for name, stats in results.items():
+        if not stats.get('count'):
+            print(f"{name:<24} {'—':>9}")
+            continue
+        rps = f"{stats['rps']:>9.1f}" if 'rps' in stats else f"{'':>9}"
+        print(f"{name:<24} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f} {rps}")
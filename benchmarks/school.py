@@ -0,0 +1,45 @@
+"""Синтетическая школа для замеров: data.csv и website_data.db нужного размера.
+
+Строится generate_school.py из корня репозитория. Образцы — только ученики
+со строками за 9 класс (его показывает страница ученика), средние оценки
+без сдвига: строки учеников повторяют образцы, как в прежних замерах.
+
+Логины: student<N> / pass<N> (N — номер ученика), teacher<N> / pass<N>.
+
+Запуск: python benchmarks/school.py out_dir [--students 1000 --teachers 50]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import generate_school
+
+CLASS_NUM = 9
+
+
+def make_school(out_dir, n_students=1000, n_teachers=50, rows_per_student=None, seed=0):
+    """Создает out_dir/data.csv и out_dir/website_data.db. Возвращает пути к ним."""
+    data_path, db_path, _ = generate_school.make_school(out_dir, n_students, n_teachers, rows_per_student, seed,
+                                                        jitter=0.0, require_class=CLASS_NUM)
+    return data_path, db_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетическая школа для замеров")
+    parser.add_argument('out_dir', type=Path)
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--teachers', type=int, default=50)
+    parser.add_argument('--rows-per-student', type=int, help="по умолчанию — как у ученика-образца")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    data_path, db_path = make_school(args.out_dir, args.students, args.teachers,
+                                     args.rows_per_student, args.seed)
+    print(f"{data_path}\n{db_path}")
+
+
+if __name__ == '__main__':
+    main()
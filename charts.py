@@ -0,0 +1,233 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from html import escape
+from pathlib import Path
+
+from analysis import analyze
+
+_WIDTH = 800
+_LABEL_WIDTH = 190
+_PLOT_WIDTH = 560
+_TOP = 50
+_ROW_HEIGHT = 34
+_BAR_HEIGHT = 20
+_MAX_LEVEL = 5
+
+
+def render_risk_chart(subjects, prediction):
+    """Горизонтальная диаграмма рисков по предметам в виде SVG-разметки.
+
+    Строится строковым шаблоном без matplotlib: не держит глобального
+    состояния, безопасна для потоков и не накапливает фигуры в памяти.
+    """
+    result = analyze([prediction])
+    risk_levels = result.levels[0, :len(subjects)].tolist()
+    colors = result.colors[0, :len(subjects)].tolist()
+
+    scale = _PLOT_WIDTH / _MAX_LEVEL
+    plot_bottom = _TOP + _ROW_HEIGHT * len(subjects)
+    height = plot_bottom + 60
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {_WIDTH} {height}" '
+        f'style="width: 100%; max-width: {_WIDTH}px; font-family: sans-serif;">',
+        f'<text x="{_WIDTH / 2}" y="24" text-anchor="middle" font-size="16">'
+        f'Риски успеваемости по предметам</text>',
+    ]
+
+    for tick in range(_MAX_LEVEL + 1):
+        x = _LABEL_WIDTH + tick * scale
+        parts.append(f'<line x1="{x:.1f}" y1="{_TOP}" x2="{x:.1f}" y2="{plot_bottom}" stroke="#e0e0e0"/>')
+        parts.append(f'<text x="{x:.1f}" y="{plot_bottom + 18}" text-anchor="middle" font-size="12">{tick}</text>')
+
+    for i, (subject, level, color) in enumerate(zip(subjects, risk_levels, colors)):
+        y = _TOP + i * _ROW_HEIGHT + (_ROW_HEIGHT - _BAR_HEIGHT) / 2
+        bar_width = max(0, min(level, _MAX_LEVEL)) * scale
+        parts.append(f'<text x="{_LABEL_WIDTH - 8}" y="{y + _BAR_HEIGHT / 2 + 4}" '
+                     f'text-anchor="end" font-size="12">{escape(subject)}</text>')
+        parts.append(f'<rect x="{_LABEL_WIDTH}" y="{y}" width="{bar_width:.1f}" '
+                     f'height="{_BAR_HEIGHT}" fill="{color}"/>')
+        parts.append(f'<text x="{_LABEL_WIDTH + bar_width + 6:.1f}" y="{y + _BAR_HEIGHT / 2 + 4}" '
+                     f'font-size="12" font-weight="bold">{level:.1f}</text>')
+
+    parts.append(f'<line x1="{_LABEL_WIDTH}" y1="{plot_bottom}" x2="{_LABEL_WIDTH + _PLOT_WIDTH}" '
+                 f'y2="{plot_bottom}" stroke="#333"/>')
+    parts.append(f'<text x="{_LABEL_WIDTH + _PLOT_WIDTH / 2}" y="{plot_bottom + 44}" '
+                 f'text-anchor="middle" font-size="13">Уровень риска (1-5)</text>')
+    parts.append('</svg>')
+    return "".join(parts)
+
+
+# Подписи и цвета оценок на графике класса
+GRADE_LABELS = {5: 'Отлично', 4: 'Хорошо', 3: 'Удовлетворительно', 2: 'Неудовлетворительно'}
+GRADE_COLORS = {5: '#4CAF50', 4: '#8BC34A', 3: '#FFC107', 2: '#F44336'}
+
+
+def render_class_chart(counts, title):
+    """Столбчатая диаграмма числа учеников по оценкам (counts: {оценка: число}) в SVG."""
+    width, height = 640, 320
+    left, top, bottom = 50, 40, 50
+    plot_height = height - top - bottom
+    column = (width - left) / len(GRADE_LABELS)
+    max_count = max(max(counts.values(), default=0), 1)
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'style="width: 100%; max-width: 500px; margin: 0 auto; display: block; font-family: sans-serif;">',
+        f'<text x="{width / 2}" y="22" text-anchor="middle" font-size="15">{escape(title)}</text>',
+        f'<text x="14" y="{top + plot_height / 2}" font-size="11" text-anchor="middle" '
+        f'transform="rotate(-90 14 {top + plot_height / 2})">Количество учеников</text>',
+    ]
+    for i, grade in enumerate(GRADE_LABELS):
+        count = counts.get(grade, 0)
+        bar_height = plot_height * count / max_count
+        x = left + i * column + column * 0.15
+        y = top + plot_height - bar_height
+        parts.append(f'<rect x="{x:.1f}" y="{y:.1f}" width="{column * 0.7:.1f}" '
+                     f'height="{bar_height:.1f}" fill="{GRADE_COLORS[grade]}"/>')
+        parts.append(f'<text x="{x + column * 0.35:.1f}" y="{y - 4:.1f}" text-anchor="middle" '
+                     f'font-size="12">{count}</text>')
+        parts.append(f'<text x="{x + column * 0.35:.1f}" y="{top + plot_height + 18}" '
+                     f'text-anchor="middle" font-size="11">{GRADE_LABELS[grade]}</text>')
+    parts.append(f'<line x1="{left}" y1="{top + plot_height}" x2="{width}" '
+                 f'y2="{top + plot_height}" stroke="#333"/>')
+    parts.append('</svg>')
+    return "".join(parts)
+
+
+TREND_COLOR = '#1976d2'
+ROLLING_COLOR = '#ff9800'
+
+
+def render_trend_chart(labels, averages, rolling, title="Средняя оценка по четвертям"):
+    """Линии средней оценки по четвертям и ее скользящего среднего в SVG (шкала оценок 2–5)."""
+    width, height = 800, 300
+    left, right, top, bottom = 50, 20, 40, 50
+    plot_width, plot_height = width - left - right, height - top - bottom
+    low, high = 2.0, 5.0
+    step = plot_width / max(len(labels) - 1, 1)
+
+    def x(i):
+        return left + i * step
+
+    def y(value):
+        return top + plot_height * (high - min(max(value, low), high)) / (high - low)
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'style="width: 100%; max-width: {width}px; font-family: sans-serif;">',
+        f'<text x="{width / 2}" y="22" text-anchor="middle" font-size="15">{escape(title)}</text>',
+    ]
+    for grade in range(int(low), int(high) + 1):
+        parts.append(f'<line x1="{left}" y1="{y(grade):.1f}" x2="{width - right}" y2="{y(grade):.1f}" stroke="#e0e0e0"/>')
+        parts.append(f'<text x="{left - 8}" y="{y(grade) + 4:.1f}" text-anchor="end" font-size="12">{grade}</text>')
+    for i, label in enumerate(labels):
+        parts.append(f'<text x="{x(i):.1f}" y="{top + plot_height + 18}" text-anchor="middle" '
+                     f'font-size="11">{escape(label)}</text>')
+    for values, color, dash in ((rolling, ROLLING_COLOR, ' stroke-dasharray="6 4"'), (averages, TREND_COLOR, '')):
+        points = " ".join(f"{x(i):.1f},{y(value):.1f}" for i, value in enumerate(values))
+        parts.append(f'<polyline points="{points}" fill="none" stroke="{color}" stroke-width="2"{dash}/>')
+    for i, value in enumerate(averages):
+        parts.append(f'<circle cx="{x(i):.1f}" cy="{y(value):.1f}" r="3" fill="{TREND_COLOR}"/>')
+    parts.append(f'<text x="{left}" y="{height - 8}" font-size="12" fill="{TREND_COLOR}">— средняя за четверть</text>')
+    parts.append(f'<text x="{left + 220}" y="{height - 8}" font-size="12" fill="{ROLLING_COLOR}">'
+                 f'- - среднее за последние четверти</text>')
+    parts.append('</svg>')
+    return "".join(parts)
+
+
+class RenderCache:
+    """Кэш готовой разметки с адресацией по содержимому.
+
+    Ключ — вид фрагмента и вектор оценок, поэтому одинаковые предсказания
+    у разных учеников дают одну и ту же запись. Размер ограничен суммарной
+    длиной строк; вытесненные записи при заданном spill_dir сохраняются на диск.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, spill_dir=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir is not None else None
+        if self.spill_dir is not None:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(kind, prediction):
+        return kind, tuple(int(grade) for grade in prediction)
+
+    def _spill_path(self, key):
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return self.spill_dir / f"{key[0]}-{name}.html"
+
+    def _remember(self, key, value):
+        """Кладет запись под блокировкой; возвращает вытесненные пары для _spill_all."""
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._items[key] = value
+        self._size += len(value)
+        evicted = []
+        while self._size > self.max_bytes and len(self._items) > 1:
+            old_key, old_value = self._items.popitem(last=False)
+            self._size -= len(old_value)
+            evicted.append((old_key, old_value))
+        return evicted
+
+    def _spill_all(self, evicted):
+        # вызывается без блокировки: запись файлов не задерживает другие запросы
+        if self.spill_dir is not None:
+            for key, value in evicted:
+                self._spill(key, value)
+
+    def _spill(self, key, value):
+        path = self._spill_path(key)
+        if not path.exists():
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(value, encoding='utf-8')
+            os.replace(tmp, path)
+
+    def get_or_render(self, kind, prediction, render):
+        """Готовая разметка для вектора оценок; render(prediction) вызывается только при промахе."""
+        key = self.make_key(kind, prediction)
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = None
+        if self.spill_dir is not None:
+            path = self._spill_path(key)
+            if path.exists():
+                value = path.read_text(encoding='utf-8')
+        if value is not None:
+            with self._lock:
+                self.spill_hits += 1
+                evicted = self._remember(key, value)
+            self._spill_all(evicted)
+            return value
+
+        value = render(list(key[1]))
+        with self._lock:
+            self.misses += 1
+            evicted = self._remember(key, value)
+        self._spill_all(evicted)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._items),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'spill_hits': self.spill_hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,165 @@
+"""Колоночное хранение таблицы оценок: по файлу .npy на столбец с уменьшенными типами.
+
+Строки заранее отсортированы по (ученик, класс), поэтому индекс из
+grades_index строится без перестановки, а таблица открывается через
+memory-map: процессы на одной машине делят одни и те же страницы файла.
+
+    python columnar.py data.csv data_columnar
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Типы столбцов на диске; порядок совпадает с data.csv и признаками модели
+SCHEMA = {
+    'Student': 'int32',
+    'Period': 'int8',
+    'Class': 'int8',
+    'Is_new_sub': 'int8',
+    'Average_grade': 'float32',
+    'Perform_trend': 'int8',
+    'Gender_М': 'bool',
+    'Subject_3': 'float32',
+    'Subject_4': 'float32',
+    'Subject_5': 'float32',
+}
+META_FILE = 'meta.json'
+
+
+def _scan_csv(csv_path):
+    """Число строк данных и длина файла до конца последней полной строки."""
+    lines = 0
+    size = 0
+    last_newline = 0
+    with open(csv_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            count = block.count(b'\n')
+            if count:
+                lines += count
+                last_newline = size + block.rfind(b'\n') + 1
+            size += len(block)
+    return lines - 1, last_newline
+
+
+def _read_tail(csv_path, end, length=64):
+    with open(csv_path, 'rb') as f:
+        f.seek(max(0, end - length))
+        return f.read(end - max(0, end - length))
+
+
+def source_digest(csv_path, length):
+    """sha256 первых length байт CSV: по ней видно, что снимок сделан из этого файла."""
+    digest = hashlib.sha256()
+    remaining = length
+    with open(csv_path, 'rb') as f:
+        while remaining > 0:
+            block = f.read(min(remaining, 1 << 20))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def _read_chunks(csv_path, chunk_size, n_rows):
+    return pd.read_csv(csv_path, chunksize=chunk_size, dtype=SCHEMA, nrows=n_rows)
+
+
+def convert(csv_path, out_dir, chunk_size=1_000_000):
+    """Переводит CSV в колоночный формат, читая его кусками (память не зависит от размера файла)."""
+    out_dir = Path(out_dir)
+    tmp_dir = out_dir.with_name(out_dir.name + '.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    # Строки, дописанные во время конвертации, в снимок не попадут: их дочитает GradesStore
+    # размер и время изменения CSV до чтения: если при загрузке они те же, файл не менялся
+    source_stat = os.stat(csv_path)
+    n_rows, source_bytes = _scan_csv(csv_path)
+    # 1. Столбцы в исходном порядке строк
+    unsorted = {
+        column: np.lib.format.open_memmap(tmp_dir / f'{column}.unsorted.npy', mode='w+',
+                                          dtype=dtype, shape=(n_rows,))
+        for column, dtype in SCHEMA.items()
+    }
+    position = 0
+    for chunk in _read_chunks(csv_path, chunk_size, n_rows):
+        for column in SCHEMA:
+            unsorted[column][position:position + len(chunk)] = chunk[column].to_numpy()
+        position += len(chunk)
+    if position != n_rows:
+        raise ValueError(f"Ожидалось {n_rows} строк, прочитано {position}")
+
+    # 2. Стабильная сортировка по (ученик, класс), по одному столбцу в памяти
+    keys = (unsorted['Student'].astype(np.int64) << 16) | unsorted['Class'].astype(np.int64)
+    order = np.argsort(keys, kind='stable')
+    del keys
+    for column, dtype in SCHEMA.items():
+        np.save(tmp_dir / f'{column}.npy', np.asarray(unsorted[column])[order])
+        del unsorted[column]
+        os.remove(tmp_dir / f'{column}.unsorted.npy')
+
+    meta = {
+        'columns': list(SCHEMA),
+        'dtypes': SCHEMA,
+        'rows': n_rows,
+        # исходный CSV относительно родителя каталога и позиция, до которой он прочитан
+        'source': os.path.relpath(Path(csv_path).resolve(), out_dir.resolve().parent),
+        'source_bytes': source_bytes,
+        'source_tail': _read_tail(csv_path, source_bytes).hex(),
+        'source_sha256': source_digest(csv_path, source_bytes),
+        'source_size': source_stat.st_size,
+        'source_mtime_ns': source_stat.st_mtime_ns,
+        'created_at': time.time(),
+    }
+    (tmp_dir / META_FILE).write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    # 3. Подмена каталога целиком, чтобы читатели не увидели его наполовину записанным
+    old_dir = out_dir.with_name(out_dir.name + '.old')
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if out_dir.exists():
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return meta
+
+
+def read_meta(data_dir):
+    return json.loads((Path(data_dir) / META_FILE).read_text(encoding='utf-8'))
+
+
+def source_path(data_dir, meta):
+    """Путь к исходному CSV, из которого сделан снимок."""
+    return Path(data_dir).resolve().parent / meta['source']
+
+
+def load(data_dir, mmap=True):
+    """Открывает таблицу как DataFrame; при mmap=True столбцы не копируются в память процесса."""
+    data_dir = Path(data_dir)
+    meta = read_meta(data_dir)
+    mmap_mode = 'r' if mmap else None
+    columns = {column: np.load(data_dir / f'{column}.npy', mmap_mode=mmap_mode) for column in meta['columns']}
+    return pd.DataFrame(columns, copy=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перевод data.csv в колоночный формат")
+    parser.add_argument('csv', type=Path)
+    parser.add_argument('out_dir', type=Path)
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    meta = convert(args.csv, args.out_dir, args.chunk_size)
+    print(f"Записано строк: {meta['rows']} в {args.out_dir} за {time.perf_counter() - start:.1f} с")
+
+
+if __name__ == '__main__':
+    main()
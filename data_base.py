@@ -1,43 +1,471 @@
+import atexit
+import os
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
+
+import numpy as np
+
+from analysis import SUBJECTS_COUNT, at_risk_mask, grade_matrix
 BASE_DIR = Path(__file__).resolve().parent
+# Путь к базе можно переопределить (например, синтетическая школа для нагрузочного теста)
+DB_PATH = Path(os.environ.get('WEBSITE_DB', BASE_DIR / 'website_data.db'))
 
-class Saves:
-    def __init__(self):
-        self.file_settings = sqlite3.connect(BASE_DIR / 'website_data.db')
-        self.cursor = self.file_settings.cursor()
-        self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        print(self.cursor.fetchall())
 
+class UserCache:
+    """Кэш записей site_user по логину с ограниченным временем жизни."""
+
+    def __init__(self, ttl=60.0):
+        self.ttl = ttl
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get(self, login):
+        with self._lock:
+            item = self._items.get(login)
+            if item is None:
+                return None
+            expires, user = item
+            if expires < time.monotonic():
+                del self._items[login]
+                return None
+            return user
+
+    def set(self, login, user):
+        with self._lock:
+            self._items[login] = (time.monotonic() + self.ttl, user)
+
+    def invalidate(self, login=None):
+        """Сбрасывает запись для логина или весь кэш, если логин не указан."""
+        with self._lock:
+            if login is None:
+                self._items.clear()
+            else:
+                self._items.pop(login, None)
+
+
+class ConnectionPool:
+    """Ограниченный пул соединений с SQLite, общий для всех потоков.
+
+    Соединение выдается одному потоку на время блока ``with pool.connection()``
+    и затем возвращается в пул, поэтому файлы не утекают, а подключение
+    не открывается заново на каждый клик.
+    """
+
+    def __init__(self, db_path, size=8, timeout=10.0):
+        self.db_path = str(db_path)
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._acquires = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._connect_time = 0.0
+
+    def _connect(self):
+        start = time.perf_counter()
+        # cached_statements: подготовленные выражения переиспользуются внутри соединения
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=128)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._connect_time += elapsed
+        return conn
+
+    def _acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                start = time.perf_counter()
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"Нет свободного соединения с БД за {self.timeout} с") from None
+                with self._lock:
+                    self._waits += 1
+                    self._wait_time += time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._acquires += 1
+        return conn
+
+    def _release(self, conn):
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
 
-    # def __del__(self):
-    #     self.file_settings.close()
+    @contextmanager
+    def connection(self):
+        """Выдает соединение из пула; при выходе фиксирует или откатывает транзакцию."""
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+    def metrics(self):
+        """Показатели пула для подбора его размера."""
+        with self._lock:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+                'acquires': self._acquires,
+                'waits': self._waits,
+                'wait_time': self._wait_time,
+                'connect_time': self._connect_time,
+            }
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=None):
+    """Возвращает общий пул для файла БД, создавая его при первом обращении."""
+    db_path = str(db_path or DB_PATH)
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path)
+        return pool
+
+
+@atexit.register
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+class Saves:
+    def __init__(self, db_path=None, pool=None):
+        self.pool = pool or get_pool(db_path)
+
+    def create_indexes(self):
+        """Создает индексы, нужные для поиска пользователей и учеников (вызывается при старте)."""
+        with self.pool.connection() as conn:
+            conn.execute('''CREATE UNIQUE INDEX IF NOT EXISTS site_user_login_idx ON site_user (login)''')
+            conn.execute('''CREATE INDEX IF NOT EXISTS student_user_id_idx ON student (user_id)''')
 
 
 class SavesDataUsers(Saves):
-    # изменение паролья
-    # def save_data_user_password(self, value):
-    #     self.cursor.execute(f'''UPDATE set_user SET password = {value}''')
-    #     self.file_settings.commit()
+    def __init__(self, db_path=None, pool=None, cache=None):
+        super().__init__(db_path, pool)
+        self.cache = cache
+
+    def save_data_user_password(self, user_id, password_hash):
+        """Изменение пароля: в базу пишется только хэш (auth.hash_password)."""
+        with self.pool.connection() as conn:
+            row = conn.execute('''UPDATE site_user SET password = ? WHERE user_id = ? RETURNING login''',
+                               (password_hash, user_id)).fetchone()
+        if row is not None and self.cache is not None:
+            self.cache.invalidate(row['login'])
 
     def get_data_user(self):
-        self.cursor.execute('''SELECT * FROM site_user''')
-        columns = [column[0] for column in self.cursor.description]
+        with self.pool.connection() as conn:
+            rows = conn.execute('''SELECT * FROM site_user''').fetchall()
         users = {}
-        for row in self.cursor.fetchall():
-            user_dict = dict(zip(columns, row))
+        for row in rows:
+            user_dict = dict(row)
             users[user_dict['user_id']] = user_dict
 
         return users
 
+    def get_user_by_login(self, login):
+        """Возвращает пользователя по логину (один запрос по индексу) или None."""
+        if self.cache is not None:
+            user = self.cache.get(login)
+            if user is not None:
+                return user
+
+        with self.pool.connection() as conn:
+            row = conn.execute('''SELECT * FROM site_user WHERE login = ?''', (login,)).fetchone()
+        if row is None:
+            return None
+        user = dict(row)
+
+        if self.cache is not None:
+            self.cache.set(login, user)
+        return user
+
 
 class SavesDataStudents(Saves):
+    # ограничение SQLite на число параметров в одном запросе
+    batch_size = 500
+
     def get_data_student(self, user_id):
-        self.cursor.execute('''SELECT * FROM student''')
-        columns = [column[0] for column in self.cursor.description]
-        for row in self.cursor.fetchall():
-            student_dict = dict(zip(columns, row))
-            if student_dict['user_id'] == user_id:
-                return student_dict
-
-i=Saves()
\ No newline at end of file
+        with self.pool.connection() as conn:
+            row = conn.execute('''SELECT * FROM student WHERE user_id = ?''', (user_id,)).fetchone()
+        if row is not None:
+            return dict(row)
+
+    def get_data_students(self, user_ids):
+        """Возвращает учеников для списка user_id одним запросом: {user_id: ученик}."""
+        user_ids = list(dict.fromkeys(user_ids))
+        students = {}
+        with self.pool.connection() as conn:
+            for i in range(0, len(user_ids), self.batch_size):
+                batch = user_ids[i:i + self.batch_size]
+                placeholders = ", ".join("?" * len(batch))
+                rows = conn.execute(f'''SELECT * FROM student WHERE user_id IN ({placeholders})''', batch)
+                for row in rows:
+                    students[row['user_id']] = dict(row)
+        return students
+
+    def get_logins(self, student_ids):
+        """Логины учеников по student_id: {student_id: логин}; ученики без учетной записи пропускаются."""
+        student_ids = list(dict.fromkeys(student_ids))
+        logins = {}
+        with self.pool.connection() as conn:
+            for i in range(0, len(student_ids), self.batch_size):
+                batch = student_ids[i:i + self.batch_size]
+                placeholders = ", ".join("?" * len(batch))
+                rows = conn.execute(f'''SELECT s.student_id, u.login FROM student s
+                    JOIN site_user u ON u.user_id = s.user_id
+                    WHERE s.student_id IN ({placeholders})''', batch)
+                for row in rows:
+                    logins[row['student_id']] = row['login']
+        return logins
+
+
+class SavesDataPredictions(Saves):
+    """Заранее посчитанные предсказания модели (заполняет scoring.py).
+
+    Вместе с предсказаниями в той же транзакции обновляются сводки по
+    классам и предметам (class_summary, class_at_risk), которые читает
+    страница учителя: меняются только строки затронутых учеников.
+    """
+
+    def create_table(self):
+        with self.pool.connection() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS prediction (
+                student_id INTEGER NOT NULL,
+                class_num INTEGER NOT NULL,
+                grades TEXT NOT NULL,
+                n_rows INTEGER NOT NULL,
+                model_version TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (student_id, class_num)
+            )''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS class_summary (
+                class_num INTEGER NOT NULL,
+                subject INTEGER NOT NULL,
+                grade_2 INTEGER NOT NULL DEFAULT 0,
+                grade_3 INTEGER NOT NULL DEFAULT 0,
+                grade_4 INTEGER NOT NULL DEFAULT 0,
+                grade_5 INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (class_num, subject)
+            )''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS class_at_risk (
+                class_num INTEGER NOT NULL,
+                subject INTEGER NOT NULL,
+                student_id INTEGER NOT NULL,
+                grade INTEGER NOT NULL,
+                PRIMARY KEY (class_num, subject, student_id)
+            )''')
+
+    @staticmethod
+    def _apply_to_summary(conn, changes):
+        """Переносит изменения оценок [(ученик, класс, старые или None, новые)] в сводки.
+
+        Изменившиеся оценки всех учеников находятся одним сравнением массивов (n, 9).
+        """
+        changes = list(changes)
+        if not changes:
+            return
+        student_ids = np.array([change[0] for change in changes], dtype=np.int64)
+        class_nums = np.array([change[1] for change in changes], dtype=np.int64)
+        new = grade_matrix([change[3] for change in changes])
+        old = grade_matrix([change[2] if change[2] is not None else [] for change in changes])
+        # у новых записей прежних оценок нет: 0 не совпадает ни с одной оценкой
+        old[np.array([change[2] is None for change in changes])] = 0
+
+        rows, subjects = np.nonzero(old != new)
+        classes, class_idx = np.unique(class_nums[rows], return_inverse=True)
+        old_grades, new_grades = old[rows, subjects], new[rows, subjects]
+        # счетчики оценок 2–5 по (класс, предмет)
+        counts = np.zeros((len(classes), SUBJECTS_COUNT, 4), dtype=np.int64)
+        for grades, sign in ((old_grades, -1), (new_grades, 1)):
+            known = (grades >= 2) & (grades <= 5)
+            np.add.at(counts, (class_idx[known], subjects[known], grades[known] - 2), sign)
+        touched = np.unique(np.stack([class_idx, subjects], axis=1), axis=0)
+        deltas = {(int(classes[c]), int(subject)): dict(zip((2, 3, 4, 5), counts[c, subject].tolist()))
+                  for c, subject in touched}
+
+        risk = at_risk_mask(new_grades)
+        at_risk = list(zip(class_nums[rows][risk].tolist(), subjects[risk].tolist(),
+                           student_ids[rows][risk].tolist(), new_grades[risk].tolist()))
+        not_at_risk = list(zip(class_nums[rows][~risk].tolist(), subjects[~risk].tolist(),
+                               student_ids[rows][~risk].tolist()))
+
+        conn.executemany('''INSERT OR IGNORE INTO class_summary (class_num, subject) VALUES (?, ?)''',
+                         deltas.keys())
+        conn.executemany(
+            '''UPDATE class_summary SET grade_2 = grade_2 + ?, grade_3 = grade_3 + ?,
+            grade_4 = grade_4 + ?, grade_5 = grade_5 + ? WHERE class_num = ? AND subject = ?''',
+            ((d[2], d[3], d[4], d[5], class_num, subject) for (class_num, subject), d in deltas.items()))
+        conn.executemany('''INSERT OR REPLACE INTO class_at_risk VALUES (?, ?, ?, ?)''', at_risk)
+        conn.executemany(
+            '''DELETE FROM class_at_risk WHERE class_num = ? AND subject = ? AND student_id = ?''',
+            not_at_risk)
+
+    def save_predictions(self, rows, model_version):
+        """Сохраняет строки (student_id, class_num, оценки) одной транзакцией."""
+        now = time.time()
+        changes = []
+        records = []
+        with self.pool.connection() as conn:
+            for student_id, class_num, grades in rows:
+                student_id, class_num = int(student_id), int(class_num)
+                grades = [int(g) for g in grades]
+                old = conn.execute(
+                    '''SELECT grades FROM prediction WHERE student_id = ? AND class_num = ?''',
+                    (student_id, class_num)).fetchone()
+                old_grades = [int(g) for g in old['grades'].split(",")] if old is not None else None
+                changes.append((student_id, class_num, old_grades, grades))
+                records.append((student_id, class_num, ",".join(map(str, grades)), len(grades),
+                                model_version, now))
+            conn.executemany('''INSERT OR REPLACE INTO prediction VALUES (?, ?, ?, ?, ?, ?)''', records)
+            self._apply_to_summary(conn, changes)
+
+    def clear(self):
+        """Удаляет все предсказания и сводки: таблица оценок перезагружена целиком."""
+        with self.pool.connection() as conn:
+            conn.execute('''DELETE FROM prediction''')
+            conn.execute('''DELETE FROM class_summary''')
+            conn.execute('''DELETE FROM class_at_risk''')
+
+    def rebuild_summary(self):
+        """Пересчитывает сводки по классам целиком из таблицы prediction."""
+        with self.pool.connection() as conn:
+            conn.execute('''DELETE FROM class_summary''')
+            conn.execute('''DELETE FROM class_at_risk''')
+            rows = conn.execute('''SELECT student_id, class_num, grades FROM prediction''').fetchall()
+            self._apply_to_summary(conn, (
+                (row['student_id'], row['class_num'], None, [int(g) for g in row['grades'].split(",")])
+                for row in rows))
+
+    def get_class_summary(self, class_num, subject):
+        """Число учеников с оценками 2–5 по предмету в классе: {оценка: число}."""
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                '''SELECT grade_2, grade_3, grade_4, grade_5 FROM class_summary
+                WHERE class_num = ? AND subject = ?''', (int(class_num), int(subject))).fetchone()
+        if row is None:
+            return None
+        return {2: row['grade_2'], 3: row['grade_3'], 4: row['grade_4'], 5: row['grade_5']}
+
+    def get_class_at_risk(self, class_num, subject):
+        """Ученики с прогнозом 2 или 3 по предмету: список (student_id, оценка, логин или None)."""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                '''SELECT r.student_id, r.grade, u.login FROM class_at_risk r
+                LEFT JOIN student s ON s.student_id = r.student_id
+                LEFT JOIN site_user u ON u.user_id = s.user_id
+                WHERE r.class_num = ? AND r.subject = ?
+                ORDER BY r.grade, r.student_id''', (int(class_num), int(subject))).fetchall()
+        return [(row['student_id'], row['grade'], row['login']) for row in rows]
+
+    def get_prediction(self, student_id, class_num, model_version, n_rows=None):
+        """Оценки для ученика в классе или None, если их нет или они устарели."""
+        try:
+            with self.pool.connection() as conn:
+                row = conn.execute(
+                    '''SELECT grades, n_rows FROM prediction
+                    WHERE student_id = ? AND class_num = ? AND model_version = ?''',
+                    (int(student_id), int(class_num), model_version)).fetchone()
+        except sqlite3.OperationalError:
+            # таблица еще не создана: пакетный расчет не запускался
+            return None
+        if row is None or (n_rows is not None and row['n_rows'] != n_rows):
+            return None
+        return [int(g) for g in row['grades'].split(",")]
+
+
+class SavesDataPredictionCache(Saves):
+    """Постоянное хранилище для prediction_cache.PredictionCache."""
+
+    def create_table(self):
+        with self.pool.connection() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS prediction_cache (
+                cache_key TEXT PRIMARY KEY,
+                student_id INTEGER NOT NULL,
+                grades TEXT NOT NULL
+            )''')
+            conn.execute('''CREATE INDEX IF NOT EXISTS prediction_cache_student_idx
+                ON prediction_cache (student_id)''')
+
+    def get_cached_prediction(self, cache_key):
+        with self.pool.connection() as conn:
+            row = conn.execute('''SELECT grades FROM prediction_cache WHERE cache_key = ?''',
+                               (cache_key,)).fetchone()
+        if row is not None:
+            return [int(g) for g in row['grades'].split(",")]
+
+    def save_cached_prediction(self, cache_key, student_id, grades):
+        with self.pool.connection() as conn:
+            conn.execute('''INSERT OR REPLACE INTO prediction_cache VALUES (?, ?, ?)''',
+                         (cache_key, int(student_id), ",".join(str(int(g)) for g in grades)))
+
+    def delete_cached_predictions(self, student_ids=None):
+        """Удаляет записи учеников; без аргумента очищает таблицу."""
+        with self.pool.connection() as conn:
+            if student_ids is None:
+                conn.execute('''DELETE FROM prediction_cache''')
+            else:
+                conn.executemany('''DELETE FROM prediction_cache WHERE student_id = ?''',
+                                 ((int(student_id),) for student_id in student_ids))
+
+    def delete_other_versions(self, model_version):
+        """Удаляет записи всех версий модели, кроме model_version (версия — конец ключа)."""
+        suffix = f":{model_version}"
+        with self.pool.connection() as conn:
+            conn.execute('''DELETE FROM prediction_cache WHERE substr(cache_key, -?) != ?''',
+                         (len(suffix), suffix))
+
+    def trim_cached_predictions(self, max_rows):
+        """Оставляет max_rows последних записанных строк (INSERT OR REPLACE выдает новый rowid)."""
+        with self.pool.connection() as conn:
+            conn.execute('''DELETE FROM prediction_cache WHERE rowid <= (
+                SELECT rowid FROM prediction_cache ORDER BY rowid DESC LIMIT 1 OFFSET ?)''',
+                         (int(max_rows),))
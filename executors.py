@@ -0,0 +1,169 @@
+"""Пулы для блокирующей работы асинхронных обработчиков Gradio.
+
+Запросы к SQLite идут в пул потоков db, расчет модели и отрисовка — в
+отдельный пул inference (потоки или процессы), поэтому медленный расчет
+не занимает потоки, на которых обслуживается вход.
+
+Сервер Gradio остается одним процессом: очередь и сессии (gr.State, поток
+SSE) живут в его памяти, и запросы одной сессии нельзя разнести по разным
+процессам за одним портом. Масштабируется расчет: процессы inference
+создаются через fork после загрузки ресурсов и делят модель и таблицу
+оценок с родителем (copy-on-write, колоночная таблица — через memory-map).
+"""
+import asyncio
+import gc
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+DB_WORKERS = int(os.environ.get("DB_WORKERS", 8))
+# проверка паролей (scrypt): отдельный пул, чтобы перебор паролей не занимал потоки БД
+AUTH_WORKERS = int(os.environ.get("AUTH_WORKERS", 4))
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", 4))
+# выгрузки отчетов (export.py) идут минутами на большой школе: свой пул, он же лимит очереди
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", 1))
+# 0 — считать в потоках; N > 0 — в N процессах
+INFERENCE_PROCESSES = int(os.environ.get("INFERENCE_PROCESSES", 0))
+
+# Ограничения очереди Gradio: вход и анализ не занимают слоты друг друга
+LOGIN_CONCURRENCY = int(os.environ.get("LOGIN_CONCURRENCY", 16))
+ANALYZE_CONCURRENCY = int(os.environ.get("ANALYZE_CONCURRENCY", 4))
+QUEUE_SIZE = int(os.environ.get("QUEUE_SIZE", 256))
+# для остальных событий (переходы между страницами)
+DEFAULT_CONCURRENCY = int(os.environ.get("DEFAULT_CONCURRENCY", 32))
+
+_lock = threading.Lock()
+_db_executor = None
+_auth_executor = None
+_inference_executor = None
+_export_executor = None
+_process_executor = None
+
+
+def configure(db_workers=None, inference_workers=None, inference_processes=None):
+    """Задает размеры пулов; вызывается при старте до первого запроса."""
+    global DB_WORKERS, INFERENCE_WORKERS, INFERENCE_PROCESSES
+    with _lock:
+        if db_workers is not None:
+            DB_WORKERS = db_workers
+        if inference_workers is not None:
+            INFERENCE_WORKERS = inference_workers
+        if inference_processes is not None:
+            INFERENCE_PROCESSES = inference_processes
+
+
+def _get_db_executor():
+    global _db_executor
+    with _lock:
+        if _db_executor is None:
+            _db_executor = ThreadPoolExecutor(DB_WORKERS, thread_name_prefix="db")
+        return _db_executor
+
+
+def _get_auth_executor():
+    global _auth_executor
+    with _lock:
+        if _auth_executor is None:
+            _auth_executor = ThreadPoolExecutor(AUTH_WORKERS, thread_name_prefix="auth")
+        return _auth_executor
+
+
+def _get_inference_executor():
+    global _inference_executor
+    with _lock:
+        if _inference_executor is None:
+            _inference_executor = ThreadPoolExecutor(INFERENCE_WORKERS, thread_name_prefix="inference")
+        return _inference_executor
+
+
+def _get_export_executor():
+    global _export_executor
+    with _lock:
+        if _export_executor is None:
+            _export_executor = ThreadPoolExecutor(EXPORT_WORKERS, thread_name_prefix="export")
+        return _export_executor
+
+
+def _get_process_executor():
+    global _process_executor
+    with _lock:
+        if _process_executor is None and INFERENCE_PROCESSES > 0:
+            if "fork" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("fork")
+            else:
+                context = multiprocessing.get_context()
+            _process_executor = ProcessPoolExecutor(INFERENCE_PROCESSES, mp_context=context)
+        return _process_executor
+
+
+def _ping():
+    return os.getpid()
+
+
+def start_processes():
+    """Создает процессы inference сразу; вызывается после загрузки ресурсов и до запуска сервера.
+
+    Объекты родителя переводятся в постоянное поколение сборщика мусора
+    (gc.freeze), чтобы сборка в дочерних процессах не записывала в их
+    заголовки и не копировала страницы с моделью и таблицей.
+    Возвращает pid процессов, ответивших на проверочную задачу.
+    """
+    if INFERENCE_PROCESSES <= 0:
+        return []
+    gc.collect()
+    gc.freeze()
+    executor = _get_process_executor()
+    # с fork пул запускает все процессы при первой задаче
+    return sorted({future.result() for future in [executor.submit(_ping) for _ in range(INFERENCE_PROCESSES)]})
+
+
+def predict_rows(rows):
+    """Расчет модели для строк признаков; выполняется в пуле inference."""
+    from resources import model
+    return model.get().predict(rows).tolist()
+
+
+async def run_db(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_get_db_executor(), partial(fn, *args))
+
+
+async def run_auth(fn, *args):
+    """Хэширование паролей: hashlib.scrypt отпускает GIL, цикл событий не ждет."""
+    return await asyncio.get_running_loop().run_in_executor(_get_auth_executor(), partial(fn, *args))
+
+
+async def run_cpu(fn, *args):
+    """Отрисовка и прочая CPU-работа в потоках пула inference."""
+    return await asyncio.get_running_loop().run_in_executor(_get_inference_executor(), partial(fn, *args))
+
+
+async def run_export(fn, *args):
+    """Выгрузка отчета: не занимает потоки inference, которые нужны страницам учеников."""
+    return await asyncio.get_running_loop().run_in_executor(_get_export_executor(), partial(fn, *args))
+
+
+async def run_predict(rows):
+    """Расчет модели: в процессах, если они включены, иначе в потоках пула inference."""
+    executor = _get_process_executor() or _get_inference_executor()
+    return await asyncio.get_running_loop().run_in_executor(executor, predict_rows, rows)
+
+
+def submit_auth(fn, *args):
+    """Фоновое хэширование паролей (перевод старого пароля в хэш): в пуле auth, не в inference."""
+    return _get_auth_executor().submit(fn, *args)
+
+
+def submit_background(fn, *args):
+    """Фоновая задача вне пути запроса (пересчет после новых оценок)."""
+    return _get_inference_executor().submit(fn, *args)
+
+
+def shutdown():
+    global _db_executor, _auth_executor, _inference_executor, _export_executor, _process_executor
+    with _lock:
+        for executor in (_db_executor, _auth_executor, _inference_executor, _export_executor, _process_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        _db_executor = _auth_executor = _inference_executor = _export_executor = _process_executor = None
@@ -0,0 +1,195 @@
+"""Выгрузка прогнозов по классу или всей школе в CSV или XLSX.
+
+Строки таблицы оценок берутся пакетами по batch_rows строк, модель
+считает каждый пакет одним вызовом, а строки отчета сразу пишутся в
+файл: память не зависит от размера школы. Для XLSX нужен openpyxl
+(режим write_only), для CSV зависимостей нет.
+
+    python export.py --class-num 9 --format xlsx --out report_9.xlsx
+    python export.py --format csv --out school.csv
+"""
+import argparse
+import csv
+import importlib.util
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from analysis import FILL_GRADE, SUBJECTS, SUBJECTS_COUNT, Analysis
+
+FORMATS = ('csv', 'xlsx')
+BATCH_ROWS = int(os.environ.get("EXPORT_BATCH_ROWS", 50_000))
+# Готовые файлы для скачивания; старше EXPORT_TTL секунд удаляются при следующей выгрузке
+EXPORT_DIR = Path(os.environ.get("EXPORT_DIR", Path(tempfile.gettempdir()) / "school_exports"))
+EXPORT_TTL = float(os.environ.get("EXPORT_TTL", 3600))
+
+HEADER = [
+    "Ученик", "Логин", "Класс",
+    *(f"Прогноз: {subject}" for subject in SUBJECTS),
+    *(f"Риск: {subject}" for subject in SUBJECTS),
+    "Средняя оценка", "Предметов в зоне риска", "Рекомендации",
+]
+
+
+def _positions(starts, lengths):
+    """Номера строк срезов [start, start + length) подряд."""
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+
+def iter_batches(index, class_num=None, batch_rows=BATCH_ROWS):
+    """Пакеты пар (ученик, класс): (ключи (n, 2), строки признаков, число строк каждой пары).
+
+    Пакет набирается из целых пар, пока в нем меньше batch_rows строк. Строки
+    пары — срез основной таблицы и срез дописанных строк (delta), как в
+    index.get; таблицы не сливаются, копируются только строки пакета.
+    """
+    items = [part for part in index.parts() if class_num is None or part[0][1] == class_num]
+    if not items:
+        return
+    keys = np.array([key for key, _, _ in items], dtype=np.int64)
+    bounds = np.array([(*base, *delta) for _, base, delta in items], dtype=np.int64).reshape(-1, 4)
+    base_starts, base_lengths = bounds[:, 0], bounds[:, 1] - bounds[:, 0]
+    delta_starts, delta_lengths = bounds[:, 2], bounds[:, 3] - bounds[:, 2]
+    lengths = base_lengths + delta_lengths
+    # границы пакетов: пара, на которой накопленное число строк переходит через batch_rows
+    ends = np.cumsum(lengths)
+    cuts = np.unique(np.searchsorted(ends, np.arange(batch_rows, ends[-1], batch_rows), side='left') + 1)
+    for first, last in zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [len(items)]))):
+        if first >= last:
+            continue
+        part = slice(first, last)
+        rows = index.frame.iloc[_positions(base_starts[part], base_lengths[part])]
+        if delta_lengths[part].any():
+            new_rows = index.delta.frame.iloc[_positions(delta_starts[part], delta_lengths[part])]
+            # строки каждой пары подряд: сначала из основной таблицы, затем дописанные
+            starts = np.stack([np.cumsum(base_lengths[part]) - base_lengths[part],
+                               len(rows) + np.cumsum(delta_lengths[part]) - delta_lengths[part]], axis=1)
+            counts = np.stack([base_lengths[part], delta_lengths[part]], axis=1)
+            rows = pd.concat([rows, new_rows]).iloc[_positions(starts.ravel(), counts.ravel())]
+        yield keys[part], rows, lengths[part]
+
+
+def grades_by_key(predictions, lengths):
+    """Предсказания пакета по строкам в матрицу (пар, 9), как на странице ученика."""
+    matrix = np.full((len(lengths), SUBJECTS_COUNT), FILL_GRADE, dtype=np.int64)
+    owners = np.repeat(np.arange(len(lengths)), lengths)
+    positions = np.arange(len(predictions)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    shown = positions < SUBJECTS_COUNT
+    matrix[owners[shown], positions[shown]] = np.asarray(predictions)[shown]
+    return matrix
+
+
+def report_rows(index, model, class_num=None, batch_rows=BATCH_ROWS, logins=None):
+    """Строки отчета (без заголовка) по одной на пару (ученик, класс).
+
+    logins(student_ids) -> {student_id: логин} вызывается один раз на пакет.
+    """
+    for keys, rows, lengths in iter_batches(index, class_num, batch_rows):
+        result = Analysis(grades_by_key(model.predict(rows), lengths))
+        names = logins(keys[:, 0].tolist()) if logins is not None else {}
+        for (student_id, key_class), grades, levels, average, count, text in zip(
+                keys.tolist(), result.grades.tolist(), result.levels.tolist(), result.averages.tolist(),
+                result.at_risk_counts.tolist(), result.recommendations):
+            yield [student_id, names.get(student_id, ""), key_class, *grades, *levels, average, count, text]
+
+
+def write_csv(rows, path):
+    # utf-8-sig: Excel открывает кириллицу без выбора кодировки
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(HEADER)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_xlsx(rows, path):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise RuntimeError("Для выгрузки в XLSX установите openpyxl (pip install openpyxl) или выберите CSV")
+    # write_only: строки сразу уходят во временный XML, лист целиком в памяти не строится
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Прогноз")
+    sheet.append(HEADER)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    workbook.save(path)
+    return count
+
+
+WRITERS = {'csv': write_csv, 'xlsx': write_xlsx}
+
+
+def available_formats():
+    """Форматы, которые можно выгрузить в этой установке (XLSX — только с openpyxl)."""
+    return FORMATS if importlib.util.find_spec('openpyxl') is not None else ('csv',)
+
+
+def write_report(rows, path, fmt):
+    """Пишет строки отчета в файл; возвращает их число."""
+    if fmt not in WRITERS:
+        raise ValueError(f"Неизвестный формат {fmt!r}, доступны: {', '.join(FORMATS)}")
+    return WRITERS[fmt](rows, path)
+
+
+def report_name(class_num, fmt):
+    scope = f"{class_num}_класс" if class_num is not None else "школа"
+    return f"прогноз_{scope}_{time.strftime('%Y%m%d_%H%M%S')}.{fmt}"
+
+
+def cleanup(export_dir=EXPORT_DIR, ttl=EXPORT_TTL):
+    """Удаляет выгрузки старше ttl секунд."""
+    deadline = time.time() - ttl
+    for path in Path(export_dir).glob('*/*'):
+        try:
+            if path.stat().st_mtime < deadline:
+                path.unlink()
+                path.parent.rmdir()
+        except OSError:
+            pass
+
+
+def export_to_dir(index, model, class_num=None, fmt='csv', logins=None, export_dir=EXPORT_DIR):
+    """Выгрузка в новый каталог внутри export_dir (для скачивания с сайта): (путь, число строк)."""
+    cleanup(export_dir)
+    Path(export_dir).mkdir(parents=True, exist_ok=True)
+    path = Path(tempfile.mkdtemp(dir=export_dir)) / report_name(class_num, fmt)
+    count = write_report(report_rows(index, model, class_num, logins=logins), path, fmt)
+    return path, count
+
+
+def main():
+    from data_base import SavesDataStudents
+    from resources import grades, models
+
+    parser = argparse.ArgumentParser(description="Выгрузка прогнозов успеваемости в CSV или XLSX")
+    parser.add_argument('--class-num', type=int, help="номер класса; по умолчанию вся школа")
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--out', type=Path, help="файл отчета; по умолчанию имя с классом и датой")
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS, help="строк таблицы на один вызов модели")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    active = models.get().active()
+    out = args.out or Path(report_name(args.class_num, args.format))
+    rows = report_rows(grades.get().index, active.model, args.class_num, args.batch_rows,
+                       logins=SavesDataStudents().get_logins)
+    try:
+        count = write_report(rows, out, args.format)
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    print(f"Выгружено строк: {count} (модель {active.version}) в {out} за {time.perf_counter() - start:.1f} с")
+
+
+if __name__ == '__main__':
+    main()
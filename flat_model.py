@@ -0,0 +1,170 @@
+"""Модель model_1.pkl в виде плоских массивов NumPy.
+
+model_1.pkl — StandardScaler и OneVsRestClassifier с линейными классификаторами.
+Масштабирование переносится в веса, и предсказание сводится к одному
+умножению матриц и argmax, без проверок входа scikit-learn и без перевода
+DataFrame в массив на каждом вызове.
+
+    python flat_model.py export      # model_1.pkl -> model_1.npz
+    python flat_model.py check       # сверка с model.predict на всем data.csv
+"""
+import argparse
+import sys
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+class FlatLinearModel:
+    """Линейная модель один-против-всех: оценки классов = X @ weights + bias.
+
+    Вход — float32-массив (строки × признаки в порядке feature_names) или
+    DataFrame с этими столбцами. Оценки считаются в float64, чтобы совпадать
+    с scikit-learn и при близких значениях классов.
+    """
+
+    def __init__(self, weights, bias, classes, feature_names, source_version=None):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.bias = np.asarray(bias, dtype=np.float64)
+        self.classes_ = np.asarray(classes)
+        self.feature_names = [str(name) for name in feature_names]
+        # версия model_1.pkl (scoring.model_version), из которой получены массивы
+        self.source_version = source_version
+
+    @classmethod
+    def from_pipeline(cls, pipeline, source_version=None):
+        """Переводит StandardScaler + OneVsRestClassifier(линейный) в массивы; иначе ValueError."""
+        steps = [step for _, step in getattr(pipeline, 'steps', [(None, pipeline)])]
+        scaler, classifier = (steps[0], steps[-1]) if len(steps) == 2 else (None, steps[-1])
+        if len(steps) > 2 or (scaler is not None and not hasattr(scaler, 'scale_')):
+            raise ValueError("Поддерживается только StandardScaler и линейный классификатор")
+        estimators = getattr(classifier, 'estimators_', None)
+        binarizer = getattr(classifier, 'label_binarizer_', None)
+        if not estimators or getattr(binarizer, 'y_type_', None) != 'multiclass':
+            raise ValueError("Поддерживается только OneVsRestClassifier для нескольких классов")
+        if not all(hasattr(e, 'coef_') and e.coef_.shape[0] == 1 for e in estimators):
+            raise ValueError("Классификаторы OneVsRestClassifier должны быть линейными")
+
+        coef = np.vstack([e.coef_.ravel() for e in estimators])
+        intercept = np.array([np.ravel(e.intercept_)[0] for e in estimators])
+        if scaler is not None:
+            mean = scaler.mean_ if scaler.with_mean else np.zeros(coef.shape[1])
+            scale = scaler.scale_ if scaler.with_std else np.ones(coef.shape[1])
+            # ((x - mean) / scale) @ coef.T + b = x @ (coef / scale).T + (b - (mean / scale) @ coef.T)
+            intercept = intercept - (mean / scale) @ coef.T
+            coef = coef / scale
+        feature_names = getattr(pipeline, 'feature_names_in_', None)
+        if feature_names is None:
+            raise ValueError("Модель обучена без имен признаков")
+        return cls(coef.T, intercept, classifier.classes_, feature_names, source_version)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            version = str(data['source_version']) or None
+            return cls(data['weights'], data['bias'], data['classes'], data['feature_names'], version)
+
+    def save(self, path):
+        path = Path(path)
+        tmp = path.with_name(path.name + '.tmp.npz')
+        np.savez(tmp, weights=self.weights, bias=self.bias, classes=self.classes_,
+                 feature_names=np.array(self.feature_names), source_version=np.array(self.source_version or ''))
+        tmp.replace(path)
+
+    def features(self, frame, out=None):
+        """Столбцы признаков DataFrame в float32-массив; out — заранее выделенный буфер."""
+        if out is None:
+            out = np.empty((len(frame), len(self.feature_names)), dtype=np.float32)
+        for i, column in enumerate(self.feature_names):
+            out[:, i] = frame[column].to_numpy()
+        return out
+
+    def decision_function(self, X):
+        if not isinstance(X, np.ndarray):
+            X = self.features(X)
+        return X @ self.weights + self.bias
+
+    def predict(self, X):
+        """Классы для строк X (float32-массив или DataFrame), как у pipeline.predict."""
+        scores = self.decision_function(X)
+        # OneVsRestClassifier при равных оценках берет последний класс, argmax — первый
+        last = scores.shape[1] - 1 - np.argmax(scores[:, ::-1], axis=1)
+        return self.classes_[last]
+
+
+def flatten(model, source_version=None):
+    """Плоская версия модели или сама модель, если ее вид не поддерживается."""
+    try:
+        return FlatLinearModel.from_pipeline(model, source_version)
+    except ValueError:
+        return model
+
+
+def load(model_path=BASE_DIR / 'model_1.pkl', flat_path=None):
+    """Модель для расчета: model_1.npz, если она получена из этого model_1.pkl, иначе перевод при загрузке."""
+    from scoring import model_version
+
+    model_path = Path(model_path)
+    flat_path = Path(flat_path) if flat_path is not None else model_path.with_suffix('.npz')
+    version = model_version(model_path)
+    if flat_path.exists():
+        flat = FlatLinearModel.load(flat_path)
+        if flat.source_version == version:
+            return flat
+    import joblib
+    return flatten(joblib.load(model_path), version)
+
+
+def export(model_path=BASE_DIR / 'model_1.pkl', out_path=None):
+    import joblib
+    from scoring import model_version
+
+    model_path = Path(model_path)
+    out_path = Path(out_path) if out_path is not None else model_path.with_suffix('.npz')
+    flat = FlatLinearModel.from_pipeline(joblib.load(model_path), model_version(model_path))
+    flat.save(out_path)
+    return flat
+
+
+def check_parity(model, flat, frame, chunk_size=100_000):
+    """Число строк frame, на которых flat.predict расходится с model.predict."""
+    mismatches = 0
+    for start in range(0, len(frame), chunk_size):
+        chunk = frame.iloc[start:start + chunk_size]
+        mismatches += int(np.count_nonzero(model.predict(chunk) != flat.predict(chunk)))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Плоская NumPy-версия model_1.pkl")
+    parser.add_argument('command', choices=['export', 'check'])
+    parser.add_argument('--model', type=Path, default=BASE_DIR / 'model_1.pkl')
+    parser.add_argument('--out', type=Path, help="по умолчанию — рядом с моделью, .npz")
+    parser.add_argument('--data', type=Path, default=BASE_DIR / 'data.csv')
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    if args.command == 'export':
+        flat = export(args.model, args.out)
+        print(f"Записано: {args.out or args.model.with_suffix('.npz')} "
+              f"({len(flat.feature_names)} признаков, классы {flat.classes_.tolist()})")
+        return
+
+    import joblib
+    import pandas as pd
+
+    model = joblib.load(args.model)
+    flat = load(args.model, args.out)
+    if not isinstance(flat, FlatLinearModel):
+        sys.exit("Модель не переводится в плоский вид")
+    frame = pd.read_csv(args.data)
+    mismatches = check_parity(model, flat, frame)
+    print(f"Строк: {len(frame)}, расхождений с model.predict: {mismatches}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
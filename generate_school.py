@@ -0,0 +1,179 @@
+"""Синтетическая школа (района) нужного размера: data.csv и website_data.db.
+
+Каждый новый ученик получает строки случайного ученика-образца из
+настоящего data.csv (все четверти и классы вместе), поэтому столбцы,
+распределения признаков и число строк на (ученик, класс) как в исходной
+таблице. К средней оценке ученика добавляется небольшой постоянный сдвиг
+(--jitter): ученики не повторяют образцы один в один, а разности между
+четвертями (и Perform_trend) не меняются.
+
+Ученики создаются блоками по BLOCK_STUDENTS, у каждого блока свой
+генератор от (seed, номер блока): результат зависит только от параметров,
+а в памяти одновременно только один блок — миллионы строк пишутся на диск
+потоком. База создается заново: site_user и student с логинами
+student<N> / pass<N> (N — номер ученика) и teacher<N> / pass<N>. Пароли
+открытым текстом сайт принимает и заменяет хэшем при первом входе
+(всю базу сразу — python auth.py migrate --db ...).
+
+    python generate_school.py out_dir --students 50000 --teachers 2000
+    WEBSITE_DB=out_dir/website_data.db GRADES_CSV=out_dir/data.csv python app.py
+"""
+import argparse
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+SOURCE = BASE_DIR / 'data.csv'
+BLOCK_STUDENTS = 10_000
+# стандартное отклонение сдвига средней оценки ученика
+JITTER = 0.1
+MIN_GRADE, MAX_GRADE = 2.0, 5.0
+
+SCHEMA = [
+    '''CREATE TABLE "site_user" (
+        "user_id" INTEGER NOT NULL,
+        "login" TEXT,
+        "password" TEXT,
+        "type" TEXT,
+        "phone" INTEGER,
+        "email" TEXT,
+        PRIMARY KEY("user_id")
+    )''',
+    '''CREATE TABLE "student" (
+        "student_id" INTEGER,
+        "user_id" INTEGER,
+        PRIMARY KEY("student_id"),
+        FOREIGN KEY("user_id") REFERENCES "site_user"("user_id")
+    )''',
+]
+
+
+class Templates:
+    """Ученики-образцы: столбцы data.csv, строки каждого ученика подряд (starts, lengths)."""
+
+    def __init__(self, source=SOURCE, require_class=None):
+        frame = pd.read_csv(source)
+        if require_class is not None:
+            keep = frame.loc[frame['Class'] == require_class, 'Student'].unique()
+            frame = frame[frame['Student'].isin(keep)]
+        if frame.empty:
+            raise ValueError(f"В {source} нет учеников-образцов")
+        # stable: строки ученика остаются в порядке файла
+        frame = frame.sort_values('Student', kind='stable')
+        self.names = list(frame.columns)
+        self.columns = {name: frame[name].to_numpy() for name in self.names}
+        _, self.starts, self.lengths = np.unique(self.columns['Student'], return_index=True, return_counts=True)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def block(self, first_student, n_students, rng, rows_per_student=None, jitter=JITTER):
+        """Строки учеников first_student … first_student + n_students - 1 в формате data.csv."""
+        picks = rng.integers(len(self), size=n_students)
+        starts = self.starts[picks]
+        if rows_per_student is None:
+            lengths = self.lengths[picks]
+            offsets = np.cumsum(lengths) - lengths
+            positions = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+        else:
+            # строки образца с повторами, в порядке образца
+            lengths = np.full(n_students, rows_per_student)
+            within = np.sort(rng.integers(0, self.lengths[picks][:, None], size=(n_students, rows_per_student)), axis=1)
+            positions = (starts[:, None] + within).ravel()
+        frame = pd.DataFrame({name: self.columns[name][positions] for name in self.names})
+        frame['Student'] = np.repeat(np.arange(first_student, first_student + n_students), lengths)
+        if jitter:
+            shifts = np.repeat(rng.normal(0.0, jitter, n_students), lengths)
+            frame['Average_grade'] = np.clip(np.round(frame['Average_grade'] + shifts, 2), MIN_GRADE, MAX_GRADE)
+        return frame
+
+
+def blocks(n_students, seed, block_students=BLOCK_STUDENTS):
+    """(номер первого ученика, учеников в блоке, генератор блока)."""
+    for block, first in enumerate(range(1, n_students + 1, block_students)):
+        yield first, min(block_students, n_students + 1 - first), np.random.default_rng([seed, block])
+
+
+def write_grades(path, templates, n_students, rows_per_student=None, seed=0, jitter=JITTER):
+    """Пишет data.csv блоками; возвращает число строк."""
+    rows = 0
+    # utf-8-sig, как у исходного data.csv: метка BOM пишется один раз в начало файла
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        for first, count, rng in blocks(n_students, seed):
+            frame = templates.block(first, count, rng, rows_per_student, jitter)
+            frame.to_csv(f, header=rows == 0, index=False)
+            rows += len(frame)
+    return rows
+
+
+def write_db(path, n_students, n_teachers):
+    """Новая база: ученики с user_id = student_id = N, затем учителя; индексы как у сайта."""
+    path = Path(path)
+    path.unlink(missing_ok=True)
+    conn = sqlite3.connect(path)
+    # файл новый: журнал не нужен, при сбое его создают заново
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    for statement in SCHEMA:
+        conn.execute(statement)
+    for first in range(1, n_students + 1, BLOCK_STUDENTS):
+        ids = range(first, min(first + BLOCK_STUDENTS, n_students + 1))
+        conn.executemany(
+            'INSERT INTO site_user VALUES (?, ?, ?, ?, ?, ?)',
+            ((i, f'student{i}', f'pass{i}', 'student', 89000000000 + i, f'student{i}@kuku.ru') for i in ids))
+        conn.executemany('INSERT INTO student VALUES (?, ?)', ((i, i) for i in ids))
+        conn.commit()
+    conn.executemany(
+        'INSERT INTO site_user VALUES (?, ?, ?, ?, ?, ?)',
+        ((n_students + i, f'teacher{i}', f'pass{i}', 'teacher', 88000000000 + i, f'teacher{i}@kuku.ru')
+         for i in range(1, n_teachers + 1)))
+    conn.commit()
+    conn.close()
+
+    from data_base import Saves
+    Saves(path).create_indexes()
+
+
+def make_school(out_dir, n_students=1000, n_teachers=50, rows_per_student=None, seed=0,
+                jitter=JITTER, require_class=None, source=SOURCE):
+    """Создает out_dir/data.csv и out_dir/website_data.db. Возвращает (путь к data.csv, путь к базе, число строк)."""
+    out_dir = Path(out_dir)
+    if out_dir.resolve() == BASE_DIR:
+        raise ValueError("Синтетическая школа не пишется поверх data.csv и website_data.db сайта")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    data_path = out_dir / 'data.csv'
+    db_path = out_dir / 'website_data.db'
+    templates = Templates(source, require_class)
+    rows = write_grades(data_path, templates, n_students, rows_per_student, seed, jitter)
+    write_db(db_path, n_students, n_teachers)
+    return data_path, db_path, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетическая школа: data.csv и website_data.db нужного размера")
+    parser.add_argument('out_dir', type=Path)
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--teachers', type=int, default=50)
+    parser.add_argument('--rows-per-student', type=int, help="по умолчанию — как у ученика-образца")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--jitter', type=float, default=JITTER, help="сдвиг средней оценки ученика; 0 — копии образцов")
+    parser.add_argument('--require-class', type=int, help="образцы только из учеников с оценками за этот класс")
+    parser.add_argument('--source', type=Path, default=SOURCE, help="исходный data.csv")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        data_path, db_path, rows = make_school(args.out_dir, args.students, args.teachers, args.rows_per_student,
+                                               args.seed, args.jitter, args.require_class, args.source)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(f"{data_path}: {rows} строк, {args.students} учеников\n{db_path}\n"
+          f"за {time.perf_counter() - start:.1f} с")
+
+
+if __name__ == '__main__':
+    main()
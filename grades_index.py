@@ -0,0 +1,273 @@
+import copy
+import logging
+import os
+import threading
+import time
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def _group_keys(frame):
+    """Составной ключ (ученик, класс) в одном int64 для сортировки."""
+    students = frame['Student'].to_numpy(dtype=np.int64)
+    classes = frame['Class'].to_numpy(dtype=np.int64)
+    return (students << 16) | classes
+
+
+class StudentClassIndex:
+    """Индекс строк таблицы оценок по паре (ученик, класс).
+
+    Строки один раз стабильно сортируются по ключу (если еще не отсортированы),
+    поэтому строки одной пары лежат подряд и сохраняют исходный порядок. Поиск —
+    словарь с границами среза, результат — срез ``iloc`` без копирования данных.
+
+    Дописанные строки хранятся в отдельном небольшом индексе delta, поэтому
+    добавление стоит O(новых строк) и не копирует основную таблицу.
+    """
+
+    def __init__(self, frame, keys=None):
+        if keys is None:
+            keys = _group_keys(frame)
+        if len(keys) > 1 and np.any(keys[1:] < keys[:-1]):
+            order = np.argsort(keys, kind='stable')
+            self.frame = frame.iloc[order]
+            self._keys = keys[order]
+        else:
+            # уже отсортировано (колоночный формат): строки не копируются
+            self.frame = frame
+            self._keys = keys
+        self.delta = None
+
+        starts = np.flatnonzero(np.diff(self._keys)) + 1
+        starts = np.concatenate(([0], starts)) if len(self._keys) else starts
+        stops = np.concatenate((starts[1:], [len(self._keys)]))
+        self._slices = {
+            (int(key >> 16), int(key & 0xFFFF)): (int(start), int(stop))
+            for key, start, stop in zip(self._keys[starts], starts, stops)
+        }
+
+    def __len__(self):
+        return len(self.frame) + (len(self.delta) if self.delta is not None else 0)
+
+    def __contains__(self, key):
+        return key in self._slices or (self.delta is not None and key in self.delta)
+
+    def keys(self):
+        if self.delta is None:
+            return self._slices.keys()
+        return self._slices.keys() | self.delta.keys()
+
+    def slices(self):
+        """Пары ((ученик, класс), (начало, конец)) в порядке строк self.frame.
+
+        Только для индекса без дописанных строк — см. compacted().
+        """
+        if self.delta is not None:
+            raise ValueError("Индекс с дописанными строками: вызовите compacted()")
+        return self._slices.items()
+
+    def parts(self):
+        """Тройки ((ученик, класс), (начало, конец) в self.frame, (начало, конец) в self.delta.frame).
+
+        Ключи по возрастанию; у пары без строк в одной из таблиц срез (0, 0).
+        В отличие от compacted() таблицы не сливаются и не копируются.
+        """
+        if self.delta is None:
+            for key, bounds in self._slices.items():
+                yield key, bounds, (0, 0)
+            return
+        delta = self.delta._slices
+        for key in sorted(self._slices.keys() | delta.keys()):
+            yield key, self._slices.get(key, (0, 0)), delta.get(key, (0, 0))
+
+    def get(self, student_id, class_num):
+        """Строки ученика в классе или None, если таких нет."""
+        key = (int(student_id), int(class_num))
+        bounds = self._slices.get(key)
+        rows = self.frame.iloc[bounds[0]:bounds[1]] if bounds is not None else None
+        if self.delta is None:
+            return rows
+        new_rows = self.delta.get(*key)
+        if new_rows is None:
+            return rows
+        if rows is None:
+            return new_rows
+        return pd.concat([rows, new_rows])
+
+    def extended(self, new_rows):
+        """Новый индекс с добавленными строками; текущий индекс не меняется.
+
+        Основная таблица и ее срезы переиспользуются, пересобирается только delta.
+        """
+        new_rows = new_rows.astype(self.frame.dtypes.to_dict())
+        if self.delta is not None:
+            new_rows = pd.concat([self.delta.frame.sort_index(), new_rows])
+        index = copy.copy(self)
+        index.delta = StudentClassIndex(new_rows)
+        return index
+
+    def compacted(self):
+        """Индекс, в котором дописанные строки слиты с основной таблицей."""
+        if self.delta is None:
+            return self
+        return StudentClassIndex(pd.concat([self.frame, self.delta.frame.sort_index()]))
+
+
+class GradesStore:
+    """Таблица оценок с индексом, который обновляется при изменении data.csv.
+
+    Если CSV только дописан в конец, читаются лишь новые строки и индекс
+    расширяется; при любом другом изменении файл перечитывается целиком.
+    Вместо CSV можно передать каталог колоночного формата (columnar.py): он
+    открывается через memory-map, строки, дописанные в исходный CSV после
+    конвертации, дочитываются так же, а при смене meta.json каталог
+    перечитывается. Если начало CSV не совпадает с тем, из которого сделан
+    снимок (размер и время изменения, а при их расхождении sha256 из
+    meta.json), снимок не используется: таблица читается из CSV, в журнал
+    пишется предупреждение. Подписчики (subscribe) получают множество
+    затронутых пар (ученик, класс) или None при полной перезагрузке.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._checked_at = 0.0
+        self._load()
+
+    @property
+    def frame(self):
+        return self.index.frame
+
+    @property
+    def columnar(self):
+        return self.path.is_dir()
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def _load(self):
+        if self.columnar:
+            import columnar
+            meta = columnar.read_meta(self.path)
+            self._meta_mtime = os.stat(self.path / columnar.META_FILE).st_mtime_ns
+            csv_path = columnar.source_path(self.path, meta)
+            if csv_path.exists() and not self._snapshot_matches(csv_path, meta):
+                logger.warning("Снимок %s сделан не из текущего %s: таблица читается из CSV. "
+                               "Пересоздайте снимок: python columnar.py", self.path, csv_path)
+                self._load_csv(csv_path)
+                return
+            frame = columnar.load(self.path)
+            self.columns = list(frame.columns)
+            self.index = StudentClassIndex(frame)
+            self.csv_path = csv_path if csv_path.exists() else None
+            self._offset = meta['source_bytes']
+            self._tail = bytes.fromhex(meta['source_tail'])
+            if self.csv_path is not None:
+                # строки, дописанные в CSV после конвертации
+                self._append(os.stat(self.csv_path))
+        else:
+            self._load_csv(self.path)
+        self._mtime = os.stat(self.csv_path).st_mtime_ns if self.csv_path is not None else None
+
+    @staticmethod
+    def _snapshot_matches(csv_path, meta):
+        """Начало CSV до meta['source_bytes'] то же, из которого сделан снимок.
+
+        Если размер и время изменения CSV те же, что при конвертации, файл не
+        менялся; иначе (например, после дописывания) начало сверяется по sha256.
+        """
+        import columnar
+        stat = os.stat(csv_path)
+        if stat.st_size < meta['source_bytes']:
+            return False
+        tail = bytes.fromhex(meta['source_tail'])
+        with open(csv_path, 'rb') as f:
+            f.seek(meta['source_bytes'] - len(tail))
+            if f.read(len(tail)) != tail:
+                return False
+        if (stat.st_size, stat.st_mtime_ns) == (meta.get('source_size'), meta.get('source_mtime_ns')):
+            return True
+        if 'source_sha256' in meta:
+            return columnar.source_digest(csv_path, meta['source_bytes']) == meta['source_sha256']
+        # снимок без контрольной суммы (старый columnar.py): проверен только конец прочитанной части
+        return True
+
+    def _load_csv(self, csv_path):
+        with open(csv_path, 'rb') as f:
+            data = f.read()
+        frame = pd.read_csv(BytesIO(data))
+        self.columns = list(frame.columns)
+        self.index = StudentClassIndex(frame)
+        self.csv_path = Path(csv_path)
+        self._offset = len(data)
+        self._tail = data[-64:]
+        self._mtime = os.stat(self.csv_path).st_mtime_ns
+
+    def _append(self, stat):
+        """Дочитывает строки, дописанные в CSV после прошлой загрузки.
+
+        Возвращает множество затронутых пар (ученик, класс) или None, если файл переписан.
+        """
+        if stat.st_size < self._offset:
+            return None
+        with open(self.csv_path, 'rb') as f:
+            f.seek(self._offset - len(self._tail))
+            if f.read(len(self._tail)) != self._tail:
+                return None
+            data = f.read()
+        # последняя строка может быть еще не дописана
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return set()
+        data = data[:end]
+        new_rows = pd.read_csv(BytesIO(data), header=None, names=self.columns)
+        new_rows.index = pd.RangeIndex(len(self.index), len(self.index) + len(new_rows))
+        if len(new_rows):
+            self.index = self.index.extended(new_rows)
+        self._offset += end
+        self._tail = (self._tail + data)[-64:]
+        return set(zip(new_rows['Student'].astype(int), new_rows['Class'].astype(int)))
+
+    def _check(self):
+        """Обновляет индекс, если файлы изменились: множество пар, None (все данные) или пустое."""
+        if self.columnar:
+            import columnar
+            if os.stat(self.path / columnar.META_FILE).st_mtime_ns != self._meta_mtime:
+                self._load()
+                return None
+        if self.csv_path is None:
+            return set()
+        stat = os.stat(self.csv_path)
+        if stat.st_mtime_ns == self._mtime and stat.st_size == self._offset:
+            return set()
+        # размер прежний, а время изменения новое: файл правили на месте, а не дописывали
+        keys = self._append(stat) if stat.st_size != self._offset else None
+        if keys is None:
+            self._load()
+        self._mtime = stat.st_mtime_ns
+        return keys
+
+    def refresh(self, force=False):
+        """Проверяет файлы и обновляет индекс. Возвращает True, если данные изменились."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        with self._lock:
+            self._checked_at = now
+            keys = self._check()
+        if keys is not None and not keys:
+            return False
+        for callback in self._listeners:
+            callback(keys)
+        return True
+
+    def get(self, student_id, class_num):
+        self.refresh()
+        return self.index.get(student_id, class_num)
@@ -0,0 +1,187 @@
+"""Добавление новых оценок в data.csv без перезапуска сайта.
+
+Новые строки проверяются по признакам модели и дописываются в конец
+data.csv; работающий сайт замечает это (GradesStore.refresh), дочитывает
+только новые строки и сбрасывает кэши затронутых учеников.
+
+    python ingest.py new_period.csv            # дописать файлы
+    python ingest.py --watch incoming/         # следить за каталогом
+"""
+import argparse
+import fcntl
+import logging
+import os
+import shutil
+import sys
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from columnar import SCHEMA
+
+BASE_DIR = Path(__file__).resolve().parent
+# Признаки, которые ожидает model_1.pkl, в порядке столбцов data.csv
+FEATURE_COLUMNS = list(SCHEMA)
+
+logger = logging.getLogger(__name__)
+
+
+class IngestError(ValueError):
+    pass
+
+
+def validate(frame):
+    """Проверяет строки и приводит их к столбцам и типам data.csv."""
+    missing = [column for column in FEATURE_COLUMNS if column not in frame.columns]
+    extra = [column for column in frame.columns if column not in FEATURE_COLUMNS]
+    if missing or extra:
+        raise IngestError(f"Неверные столбцы: нет {missing}, лишние {extra}")
+    frame = frame[FEATURE_COLUMNS]
+    if frame.isna().any().any():
+        rows = frame.index[frame.isna().any(axis=1)].tolist()[:10]
+        raise IngestError(f"Пустые значения в строках {rows}")
+
+    gender = frame['Gender_М'].astype(str).str.strip().str.lower()
+    if not gender.isin(['true', 'false', '1', '0']).all():
+        raise IngestError("Gender_М должен быть True/False")
+    try:
+        frame = frame.astype({column: 'int64' for column, dtype in SCHEMA.items() if dtype.startswith('int')})
+        frame = frame.astype({column: 'float64' for column, dtype in SCHEMA.items() if dtype.startswith('float')})
+    except (TypeError, ValueError) as e:
+        raise IngestError(f"Неверный тип значения: {e}") from None
+    frame = frame.assign(**{'Gender_М': gender.isin(['true', '1'])})
+
+    checks = {
+        'Period': frame['Period'].between(1, 4),
+        'Class': frame['Class'].between(1, 11),
+        'Is_new_sub': frame['Is_new_sub'].isin([0, 1]),
+        'Average_grade': frame['Average_grade'].between(1, 5),
+        'Student': frame['Student'] > 0,
+    }
+    for column in ('Subject_3', 'Subject_4', 'Subject_5'):
+        checks[column] = frame[column].between(0, 1)
+    for column, ok in checks.items():
+        if not ok.all():
+            rows = frame.index[~ok].tolist()[:10]
+            raise IngestError(f"Недопустимые значения {column} в строках {rows}")
+    return frame
+
+
+def append_rows(frame, csv_path=BASE_DIR / 'data.csv'):
+    """Дописывает проверенные строки в конец CSV. Возвращает затронутые пары (ученик, класс)."""
+    frame = validate(frame)
+    data = frame.to_csv(header=False, index=False, lineterminator='\n')
+    with open(csv_path, 'a+b') as f:
+        # один писатель за раз: CLI и наблюдатель каталога могут работать одновременно
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+            f.write(data.encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+    return set(zip(frame['Student'].astype(int), frame['Class'].astype(int)))
+
+
+def ingest_file(path, csv_path=BASE_DIR / 'data.csv'):
+    return append_rows(pd.read_csv(path), csv_path)
+
+
+def _move(path, target_dir):
+    try:
+        shutil.move(str(path), target_dir / path.name)
+    except FileNotFoundError:
+        # файл уже убрали из каталога
+        return True
+    except OSError:
+        logger.exception("%s: не удалось перенести в %s", path.name, target_dir)
+        return False
+    return True
+
+
+def watch(directory, csv_path=BASE_DIR / 'data.csv', interval=5.0, stop=None):
+    """Следит за каталогом: каждый новый *.csv дописывается и переносится в processed/ или rejected/.
+
+    Файл берется, только когда его размер и время изменения не менялись с
+    прошлой проверки: файл, который еще копируется, ждет следующего прохода.
+    Надежнее всего копировать под другим именем (например, .csv.part) и
+    переименовывать в .csv, когда файл записан.
+    """
+    directory = Path(directory)
+    for name in ('processed', 'rejected'):
+        (directory / name).mkdir(parents=True, exist_ok=True)
+    stop = stop or threading.Event()
+    # размер и mtime файлов на прошлой проверке
+    seen = {}
+    # файлы, которые уже дописаны, но не перенесены: {путь: подкаталог}
+    unmoved = {}
+    while not stop.is_set():
+        current = {}
+        for path in sorted(directory.glob('*.csv')):
+            if path in unmoved:
+                # повторно дописывать нельзя: только переносим
+                if _move(path, directory / unmoved[path]):
+                    del unmoved[path]
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            current[path] = (stat.st_size, stat.st_mtime_ns)
+            if seen.get(path) != current[path]:
+                continue
+            try:
+                keys = ingest_file(path, csv_path)
+            except ValueError as e:  # IngestError и ошибки разбора CSV
+                logger.warning("%s: отклонен: %s", path.name, e)
+                target = 'rejected'
+            except OSError:
+                # нет прав, файл удалили: пробуем снова на следующем проходе
+                logger.exception("%s: не удалось прочитать или дописать", path.name)
+                continue
+            else:
+                logger.info("%s: добавлено пар (ученик, класс): %d", path.name, len(keys))
+                target = 'processed'
+            if not _move(path, directory / target):
+                unmoved[path] = target
+            del current[path]
+        for path in [path for path in unmoved if not path.exists()]:
+            del unmoved[path]
+        seen = current
+        stop.wait(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Добавление новых оценок в data.csv")
+    parser.add_argument('files', nargs='*', type=Path)
+    parser.add_argument('--data', type=Path, default=BASE_DIR / 'data.csv')
+    parser.add_argument('--watch', type=Path, help="каталог, за которым следить")
+    parser.add_argument('--interval', type=float, default=5.0)
+    args = parser.parse_args()
+
+    status = 0
+    for path in args.files:
+        try:
+            keys = ingest_file(path, args.data)
+        except ValueError as e:  # IngestError и ошибки разбора CSV
+            print(f"{path}: {e}", file=sys.stderr)
+            status = 1
+        else:
+            print(f"{path}: добавлено пар (ученик, класс): {len(keys)}")
+    if args.watch:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+        try:
+            watch(args.watch, args.data, args.interval)
+        except KeyboardInterrupt:
+            pass
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
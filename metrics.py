@@ -0,0 +1,175 @@
+"""Счетчики, гистограммы задержек и их выдача в текстовом формате Prometheus.
+
+Этапы обработчиков оборачиваются в span("имя"), обработчики целиком — в
+track("имя"). Страница /metrics сайта отдает render(). Модуль без внешних
+зависимостей; запись значения — несколько операций под блокировкой.
+"""
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек, секунды
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in values]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # метки -> [счетчики по корзинам (+Inf последней), сумма]
+        self._values = {}
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            item = self._values.get(labels)
+            if item is None:
+                item = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            item[0][index] += 1
+            item[1] += value
+
+    def collect(self):
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class StatsCollector:
+    """Показатели, которые считаются в других объектах (кэши, пул БД) и читаются при выдаче."""
+
+    def __init__(self, prefix, help, stats, counters=()):
+        self.prefix = prefix
+        self.help = help
+        self._stats = stats
+        self.counters = set(counters)
+
+    def collect(self):
+        lines = []
+        for key, value in self._stats().items():
+            name = f"{self.prefix}_{key}"
+            kind = "counter" if key in self.counters else "gauge"
+            lines += [f"# HELP {name} {self.help}: {key}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return lines
+
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def register(metric):
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def register_stats(prefix, help, stats, counters=()):
+    """Выдает словарь stats() как метрики prefix_<ключ>; ключи из counters — счетчики."""
+    return register(StatsCollector(prefix, help, stats, counters))
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus."""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines += metric.collect()
+    return "\n".join(lines) + "\n"
+
+
+stage_seconds = register(Histogram(
+    "app_stage_seconds", "Длительность этапа обработки запроса", ("stage",)))
+request_seconds = register(Histogram(
+    "app_request_seconds", "Длительность обработчика целиком", ("handler",)))
+requests_total = register(Counter(
+    "app_requests_total", "Запросы к обработчикам по результату", ("handler", "status")))
+
+
+def add_route(app, path="/metrics"):
+    """Добавляет страницу с метриками к приложению FastAPI, на котором работает Gradio."""
+    from starlette.responses import PlainTextResponse
+
+    def endpoint():
+        return PlainTextResponse(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    app.add_api_route(path, endpoint, methods=["GET"], include_in_schema=False)
+
+
+@contextmanager
+def span(stage):
+    """Замер этапа: время попадает в app_stage_seconds{stage=...} и в журнал на уровне DEBUG."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage)
+        logger.debug("%s: %.2f мс", stage, elapsed * 1000)
+
+
+def track(handler):
+    """Декоратор асинхронного обработчика Gradio: число вызовов по результату и длительность."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            status = "error"
+            try:
+                result = await fn(*args, **kwargs)
+                status = "ok"
+                return result
+            finally:
+                elapsed = time.perf_counter() - start
+                request_seconds.observe(elapsed, handler)
+                requests_total.inc(handler, status)
+                logger.debug("%s: %s за %.2f мс", handler, status, elapsed * 1000)
+        return wrapper
+    return decorator
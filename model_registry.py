@@ -0,0 +1,416 @@
+"""Реестр версий модели с горячей заменой и теневой проверкой кандидата.
+
+Каталог реестра (по умолчанию models/, переменная MODEL_REGISTRY):
+
+    models/<версия>/model.pkl      исходная модель
+    models/<версия>/model.npz      плоская версия (flat_model.py), если модель ее допускает
+    models/<версия>/manifest.json  sha256 файлов, дата, комментарий
+    models/current.json            {"active": версия, "candidate": версия или null, "sample_rate": доля}
+
+current.json заменяется атомарно; работающий сайт проверяет его раз в
+check_interval секунд и переключается на новую модель без перезапуска.
+Кандидат (теневая модель) считается в фоне на доле запросов, совпадение с
+активной моделью и время расчета пишутся в журнал и на /metrics.
+
+    python model_registry.py add model_2.pkl --note "обучена на 2 четверти"
+    python model_registry.py shadow <версия> --sample-rate 0.2
+    python model_registry.py activate <версия>
+    python model_registry.py list
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+REGISTRY_DIR = Path(os.environ.get("MODEL_REGISTRY", BASE_DIR / 'models'))
+POINTER_FILE = 'current.json'
+MANIFEST_FILE = 'manifest.json'
+
+logger = logging.getLogger(__name__)
+
+
+class RegistryError(Exception):
+    pass
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json(path, data):
+    """Атомарная запись: читатели видят либо старый, либо новый файл целиком."""
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class ModelEntry:
+    """Загруженная версия модели."""
+
+    def __init__(self, version, model, path=None):
+        self.version = version
+        self.model = model
+        self.path = path
+
+
+def load_entry(version_dir):
+    """Загружает версию из реестра, сверив sha256 файлов с manifest.json."""
+    import flat_model
+
+    version_dir = Path(version_dir)
+    if not (version_dir / MANIFEST_FILE).exists():
+        raise RegistryError(f"Версии {version_dir.name} нет в реестре")
+    manifest = json.loads((version_dir / MANIFEST_FILE).read_text(encoding='utf-8'))
+    for name, checksum in manifest['files'].items():
+        if _sha256(version_dir / name) != checksum:
+            raise RegistryError(f"Контрольная сумма {version_dir.name}/{name} не совпадает")
+    if 'model.npz' in manifest['files']:
+        model = flat_model.FlatLinearModel.load(version_dir / 'model.npz')
+    else:
+        import joblib
+        model = joblib.load(version_dir / 'model.pkl')
+    return ModelEntry(manifest['version'], model, version_dir / 'model.pkl')
+
+
+def load_file_entry(model_path):
+    """Модель из отдельного файла (model_1.pkl), когда реестра нет."""
+    import flat_model
+    from scoring import model_version
+
+    return ModelEntry(model_version(model_path), flat_model.load(model_path), Path(model_path))
+
+
+class ModelRegistry:
+    """Активная и теневая модели из каталога реестра; обновляются при смене current.json.
+
+    Если реестра нет, активной считается fallback (model_1.pkl), пока
+    current.json не появится.
+    """
+
+    def __init__(self, directory=REGISTRY_DIR, fallback=BASE_DIR / 'model_1.pkl', check_interval=1.0):
+        self.directory = Path(directory)
+        self.fallback = Path(fallback)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._pointer_mtime = None
+        self._active = None
+        self._candidate = None
+        self.sample_rate = 0.0
+        self._reload()
+
+    def _read_pointer(self):
+        path = self.directory / POINTER_FILE
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None, None
+        return mtime, json.loads(path.read_text(encoding='utf-8'))
+
+    def _load_version(self, version, current):
+        if current is not None and current.version == version:
+            return current
+        return load_entry(self.directory / version)
+
+    def _reload(self):
+        mtime, pointer = self._read_pointer()
+        if pointer is None:
+            active = self._active if self._active is not None else load_file_entry(self.fallback)
+            candidate, sample_rate = None, 0.0
+        else:
+            active = self._load_version(pointer['active'], self._active)
+            candidate = None
+            if pointer.get('candidate'):
+                candidate = self._load_version(pointer['candidate'], self._candidate)
+            sample_rate = float(pointer.get('sample_rate', 0.0))
+        # замена ссылок: запросы, уже взявшие прежнюю модель, досчитывают на ней
+        self._active, self._candidate, self.sample_rate = active, candidate, sample_rate
+        self._pointer_mtime = mtime
+        if pointer is not None:
+            logger.info("Активная модель %s, теневая %s (доля %.2f)",
+                        active.version, candidate.version if candidate else None, sample_rate)
+
+    def refresh(self, force=False):
+        """Проверяет current.json; если он изменился, модели загружаются в фоновом потоке.
+
+        Запросы не ждут проверки контрольных сумм и загрузки: до ее конца они
+        считают на прежних моделях, затем ссылки заменяются. force=True —
+        загрузить сразу в текущем потоке.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        # модель грузит один поток, остальные не ждут
+        if not self._lock.acquire(blocking=force):
+            return
+        try:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.directory / POINTER_FILE).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+        except BaseException:
+            self._lock.release()
+            raise
+        if mtime == self._pointer_mtime:
+            self._lock.release()
+        elif force:
+            self._reload_and_release(mtime)
+        else:
+            threading.Thread(target=self._reload_and_release, args=(mtime,), name="model-reload", daemon=True).start()
+
+    def _reload_and_release(self, mtime):
+        """Загружает модели по новому current.json; вызывается с захваченным self._lock и отпускает его."""
+        try:
+            self._reload()
+        except (OSError, ValueError, KeyError, RegistryError) as e:
+            # остаемся на прежней модели; повторим при следующей смене файла
+            self._pointer_mtime = mtime
+            logger.error("Не удалось переключить модель: %s", e)
+        finally:
+            self._lock.release()
+
+    def active(self):
+        self.refresh()
+        return self._active
+
+    def candidate(self):
+        self.refresh()
+        return self._candidate
+
+
+class ShadowScorer:
+    """Теневой расчет кандидата на доле запросов вне пути ответа.
+
+    Для выборки сравнивает оценки кандидата с показанными пользователю и
+    замеряет время обеих моделей на тех же строках. Итог — stats() и
+    запись в журнал каждые log_every проверок.
+    """
+
+    def __init__(self, registry, submit, max_pending=8, log_every=100):
+        # registry — функция, возвращающая ModelRegistry (реестр загружается лениво)
+        self._registry = registry
+        self._submit = submit
+        self.max_pending = max_pending
+        self.log_every = log_every
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._reset(None)
+
+    def _reset(self, version):
+        self.version = version
+        self.samples = 0
+        self.skipped = 0
+        self.rows = 0
+        self.agree_rows = 0
+        self.agree_samples = 0
+        self.errors = 0
+        self._active_ms = []
+        self._candidate_ms = []
+
+    def maybe_score(self, rows, served):
+        """Отправляет запрос на теневую проверку с вероятностью sample_rate."""
+        registry = self._registry()
+        candidate = registry.candidate()
+        if candidate is None or random.random() >= registry.sample_rate:
+            return
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.skipped += 1
+                return
+            self._pending += 1
+        self._submit(self._score, candidate, rows, list(served))
+
+    def _score(self, candidate, rows, served):
+        try:
+            active = self._registry().active()
+            start = time.perf_counter()
+            active.model.predict(rows)
+            active_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            predicted = candidate.model.predict(rows).tolist()
+            candidate_ms = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logger.warning("Теневая модель %s: ошибка расчета: %s", candidate.version, e)
+            return
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+        served = served[:len(predicted)]
+        agree = sum(a == b for a, b in zip(served, predicted))
+        with self._lock:
+            if candidate.version != self.version:
+                self._reset(candidate.version)
+            self.samples += 1
+            self.rows += len(served)
+            self.agree_rows += agree
+            self.agree_samples += agree == len(served)
+            self._active_ms.append(active_ms)
+            self._candidate_ms.append(candidate_ms)
+            # скользящее окно для перцентилей
+            del self._active_ms[:-1000], self._candidate_ms[:-1000]
+            report = self.samples % self.log_every == 0
+        if report:
+            stats = self.stats()
+            logger.info("Теневая модель %s: %d проверок, совпадение %.1f%% строк и %.1f%% запросов, "
+                        "p50 %.3f мс (активная %.3f мс), p95 %.3f мс (активная %.3f мс)",
+                        stats['version'], stats['samples'], stats['agree_rows_pct'], stats['agree_samples_pct'],
+                        stats['candidate_p50_ms'], stats['active_p50_ms'],
+                        stats['candidate_p95_ms'], stats['active_p95_ms'])
+
+    def stats(self):
+        with self._lock:
+            active_ms = list(self._active_ms)
+            candidate_ms = list(self._candidate_ms)
+            result = {
+                'version': self.version,
+                'samples': self.samples,
+                'skipped': self.skipped,
+                'errors': self.errors,
+                'agree_rows_pct': 100.0 * self.agree_rows / self.rows if self.rows else 0.0,
+                'agree_samples_pct': 100.0 * self.agree_samples / self.samples if self.samples else 0.0,
+            }
+        for name, values in (('active', active_ms), ('candidate', candidate_ms)):
+            p50, p95 = np.percentile(values, [50, 95]) if values else (0.0, 0.0)
+            result[f'{name}_p50_ms'] = float(p50)
+            result[f'{name}_p95_ms'] = float(p95)
+        return result
+
+
+# Команды реестра
+
+def read_pointer(directory=REGISTRY_DIR):
+    path = Path(directory) / POINTER_FILE
+    if not path.exists():
+        return {'active': None, 'candidate': None, 'sample_rate': 0.0}
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def write_pointer(directory, pointer):
+    for key in ('active', 'candidate'):
+        if pointer.get(key) and not (Path(directory) / pointer[key] / MANIFEST_FILE).exists():
+            raise RegistryError(f"Версии {pointer[key]} нет в реестре")
+    _write_json(Path(directory) / POINTER_FILE, pointer)
+
+
+def add(model_path, directory=REGISTRY_DIR, note=""):
+    """Копирует модель в реестр как новую версию. Возвращает версию."""
+    import joblib
+    import flat_model
+    from scoring import model_version
+
+    directory = Path(directory)
+    version = model_version(model_path)
+    version_dir = directory / version
+    if (version_dir / MANIFEST_FILE).exists():
+        return version
+    tmp_dir = directory / f'.tmp-{version}'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    shutil.copyfile(model_path, tmp_dir / 'model.pkl')
+    model = flat_model.flatten(joblib.load(tmp_dir / 'model.pkl'), version)
+    if isinstance(model, flat_model.FlatLinearModel):
+        model.save(tmp_dir / 'model.npz')
+    files = sorted(p.name for p in tmp_dir.iterdir())
+    manifest = {
+        'version': version,
+        'source': Path(model_path).name,
+        'note': note,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'files': {name: _sha256(tmp_dir / name) for name in files},
+    }
+    _write_json(tmp_dir / MANIFEST_FILE, manifest)
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.replace(tmp_dir, version_dir)
+    return version
+
+
+def active_model_path(directory=REGISTRY_DIR, fallback=BASE_DIR / 'model_1.pkl'):
+    """Файл активной модели: из реестра, если он есть, иначе fallback."""
+    active = read_pointer(directory).get('active')
+    return Path(directory) / active / 'model.pkl' if active else Path(fallback)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Реестр версий модели")
+    parser.add_argument('--registry', type=Path, default=REGISTRY_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    add_parser = commands.add_parser('add', help="добавить модель в реестр")
+    add_parser.add_argument('model', type=Path)
+    add_parser.add_argument('--note', default="")
+    add_parser.add_argument('--activate', action='store_true', help="сразу сделать активной")
+    activate_parser = commands.add_parser('activate', help="сделать версию активной")
+    activate_parser.add_argument('version')
+    shadow_parser = commands.add_parser('shadow', help="считать версию в тени на доле запросов")
+    shadow_parser.add_argument('version', nargs='?')
+    shadow_parser.add_argument('--sample-rate', type=float, default=0.1)
+    shadow_parser.add_argument('--off', action='store_true', help="выключить теневую модель")
+    commands.add_parser('list', help="версии и их состояние")
+    commands.add_parser('verify', help="проверить контрольные суммы всех версий")
+    args = parser.parse_args()
+
+    pointer = read_pointer(args.registry)
+    try:
+        if args.command == 'add':
+            version = add(args.model, args.registry, args.note)
+            print(f"Версия {version}")
+            if args.activate:
+                write_pointer(args.registry, {**pointer, 'active': version})
+                print("Активна")
+        elif args.command == 'activate':
+            load_entry(args.registry / args.version)
+            candidate = None if pointer.get('candidate') == args.version else pointer.get('candidate')
+            sample_rate = pointer.get('sample_rate', 0.0) if candidate else 0.0
+            write_pointer(args.registry, {'active': args.version, 'candidate': candidate, 'sample_rate': sample_rate})
+            print(f"Активна {args.version}; сводки учителей: python scoring.py")
+        elif args.command == 'shadow':
+            if args.off or not args.version:
+                write_pointer(args.registry, {**pointer, 'candidate': None, 'sample_rate': 0.0})
+            else:
+                if not pointer.get('active'):
+                    raise RegistryError("Сначала сделайте активной основную модель")
+                load_entry(args.registry / args.version)
+                write_pointer(args.registry, {**pointer, 'candidate': args.version, 'sample_rate': args.sample_rate})
+            print("Теневая модель:", read_pointer(args.registry).get('candidate'))
+        elif args.command in ('list', 'verify'):
+            status = 0
+            for manifest_path in sorted(args.registry.glob(f'*/{MANIFEST_FILE}')):
+                manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+                version = manifest['version']
+                state = {pointer.get('active'): 'активна', pointer.get('candidate'): 'в тени'}.get(version, '')
+                line = f"{version}  {manifest['created_at']}  {manifest['source']:<16} {state:<8} {manifest['note']}"
+                if args.command == 'verify':
+                    try:
+                        load_entry(manifest_path.parent)
+                        line += "  ok"
+                    except RegistryError as e:
+                        line += f"  {e}"
+                        status = 1
+                print(line)
+            sys.exit(status)
+    except RegistryError as e:
+        sys.exit(str(e))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Сколько записей держит SQLite; проверка размера — раз в TRIM_EVERY записей
+STORE_MAXSIZE = 65536
+TRIM_EVERY = 1024
+
+
+def rows_hash(rows):
+    """Хэш содержимого строк признаков (без учета индекса DataFrame)."""
+    import pandas as pd
+
+    values = pd.util.hash_pandas_object(rows, index=False).to_numpy()
+    return hashlib.blake2b(values.tobytes(), digest_size=16).hexdigest()
+
+
+class PredictionCache:
+    """LRU-кэш предсказаний с ключом (ученик, класс, хэш строк, версия модели).
+
+    Если передан store (SavesDataPredictionCache), записи дублируются в SQLite
+    и переживают перезапуск: промах в памяти сначала проверяется там. Когда
+    в put приходит новая версия модели, записи прежних версий удаляются; в
+    SQLite остается не больше store_maxsize последних записей.
+    """
+
+    def __init__(self, maxsize=4096, store=None, store_maxsize=STORE_MAXSIZE):
+        self.maxsize = maxsize
+        self.store = store
+        self.store_maxsize = store_maxsize
+        self._version = None
+        self._puts = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(student_id, class_num, rows, model_version):
+        return int(student_id), int(class_num), rows_hash(rows), model_version
+
+    @staticmethod
+    def _store_key(key):
+        return ":".join(str(part) for part in key)
+
+    def _remember(self, key, prediction):
+        self._items[key] = prediction
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            prediction = self._items.get(key)
+            if prediction is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return prediction
+
+        if self.store is not None:
+            prediction = self.store.get_cached_prediction(self._store_key(key))
+            if prediction is not None:
+                with self._lock:
+                    self._remember(key, prediction)
+                    self.store_hits += 1
+                return prediction
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, prediction):
+        prediction = list(prediction)
+        version = key[3]
+        with self._lock:
+            new_version = version != self._version
+            if new_version:
+                self._version = version
+                for old in [old for old in self._items if old[3] != version]:
+                    del self._items[old]
+            self._remember(key, prediction)
+            self._puts += 1
+            trim = new_version or self._puts % TRIM_EVERY == 0
+        if self.store is not None:
+            self.store.save_cached_prediction(self._store_key(key), key[0], prediction)
+            if new_version:
+                self.store.delete_other_versions(version)
+            if trim:
+                self.store.trim_cached_predictions(self.store_maxsize)
+
+    def invalidate(self, student_ids=None):
+        """Удаляет записи указанных учеников или весь кэш, если ученики не указаны."""
+        with self._lock:
+            if student_ids is None:
+                self._items.clear()
+            else:
+                student_ids = {int(student_id) for student_id in student_ids}
+                for key in [key for key in self._items if key[0] in student_ids]:
+                    del self._items[key]
+        if self.store is not None:
+            self.store.delete_cached_predictions(student_ids)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'maxsize': self.maxsize,
+                'store_maxsize': self.store_maxsize,
+                'hits': self.hits,
+                'store_hits': self.store_hits,
+                'misses': self.misses,
+            }
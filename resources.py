@@ -0,0 +1,144 @@
+"""Тяжелые ресурсы сайта (таблица оценок, реестр моделей), загружаемые по первому обращению.
+
+Модуль легкий: pandas, numpy и scikit-learn импортируются только внутри
+загрузчиков, поэтому сервер может начать принимать соединения сразу, а
+ресурсы прогреваются в фоне (warm_up) или при первом запросе.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+# Таблицу оценок можно переопределить (например, синтетическая школа для нагрузочного теста)
+DATA_PATH = Path(os.environ.get("GRADES_CSV", BASE_DIR / 'data.csv'))
+
+
+class StartupTimer:
+    """Длительность фаз запуска: отметки по ходу импорта и загрузки ресурсов."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._last = self._started
+        self.phases = []
+
+    def mark(self, name):
+        """Записывает фазу, длившуюся с предыдущей отметки."""
+        now = time.perf_counter()
+        with self._lock:
+            self.phases.append((name, now - self._last))
+            self._last = now
+
+    @contextmanager
+    def phase(self, name):
+        """Замер блока кода; фазы могут идти параллельно (фоновый прогрев)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases.append((name, time.perf_counter() - start))
+
+    def report(self):
+        with self._lock:
+            phases = list(self.phases)
+            total = time.perf_counter() - self._started
+        width = max([len(name) for name, _ in phases] + [10])
+        lines = [f"{'фаза':<{width}} {'мс':>9}"]
+        lines += [f"{name:<{width}} {seconds * 1000:>9.1f}" for name, seconds in phases]
+        lines.append(f"{'всего':<{width}} {total * 1000:>9.1f}")
+        return "\n".join(lines)
+
+
+startup = StartupTimer()
+
+
+class LazyResource:
+    """Значение, которое загружается один раз при первом get() (потокобезопасно)."""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._value = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    with startup.phase(f"load {self.name}"):
+                        self._value = self._loader()
+                    self._loaded = True
+        return self._value
+
+
+_grades_listeners = []
+
+
+def _load_grades():
+    from grades_index import GradesStore
+    # Колоночная копия (python columnar.py data.csv data_columnar) открывается через memory-map
+    columnar_dir = DATA_PATH.with_name('data_columnar')
+    if columnar_dir.is_dir():
+        store = GradesStore(columnar_dir)
+    else:
+        store = GradesStore(DATA_PATH)
+    for callback in _grades_listeners:
+        store.subscribe(callback)
+    return store
+
+
+def _load_models():
+    # Реестр версий (model_registry.py); без него — model_1.pkl, как раньше
+    from model_registry import ModelRegistry
+    return ModelRegistry(fallback=BASE_DIR / 'model_1.pkl')
+
+
+class ActiveModel:
+    """Активная модель реестра; читается при каждом обращении, поэтому замена не требует перезапуска."""
+
+    def __init__(self, attr):
+        self._attr = attr
+
+    @property
+    def loaded(self):
+        return models.loaded
+
+    def get(self):
+        return getattr(models.get().active(), self._attr)
+
+
+# Таблица оценок с индексом по (ученик, класс); перечитывается при изменении data.csv
+grades = LazyResource("data.csv", _load_grades)
+models = LazyResource("model registry", _load_models)
+model = ActiveModel("model")
+# Версия модели, для которой берутся готовые предсказания из таблицы prediction (scoring.py)
+model_version = ActiveModel("version")
+
+
+def on_grades_change(callback):
+    """Подписка на новые строки таблицы оценок: callback(пары (ученик, класс) или None)."""
+    _grades_listeners.append(callback)
+    if grades.loaded:
+        grades.get().subscribe(callback)
+
+
+def warm_up(resources=(grades, models), background=True):
+    """Загружает ресурсы заранее: в фоновом потоке или сразу, если background=False."""
+    def run():
+        for resource in resources:
+            resource.get()
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,137 @@
+"""Пакетный расчет предсказаний для всех пар (ученик, класс) из data.csv.
+
+Результат пишется в таблицу prediction в website_data.db, откуда его читает
+сайт вместо запуска модели на каждый запрос. Запуск по ночам, например из cron:
+
+    python scoring.py --chunk-size 50000 --workers 4
+"""
+import argparse
+import hashlib
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from data_base import SavesDataPredictions
+from flat_model import flatten
+from grades_index import GradesStore
+
+warnings.filterwarnings("ignore")
+BASE_DIR = Path(__file__).resolve().parent
+
+_worker_model = None
+
+
+def model_version(path):
+    """Короткий хэш файла модели: предсказания разных версий не смешиваются."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _init_worker(model_path):
+    global _worker_model
+    warnings.filterwarnings("ignore")
+    _worker_model = flatten(joblib.load(model_path))
+
+
+def _predict_chunk(chunk):
+    return _worker_model.predict(chunk)
+
+
+def score_index(model, index, model_path, chunk_size=50000, workers=1, progress=None):
+    """Предсказания для всех строк индекса кусками по chunk_size строк.
+
+    Возвращает список (student_id, class_num, оценки) в порядке index.slices().
+    """
+    frame = index.frame
+    chunks = [frame.iloc[i:i + chunk_size] for i in range(0, len(frame), chunk_size)]
+    results = []
+    done = 0
+
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(str(model_path),))
+        predictions_iter = executor.map(_predict_chunk, chunks)
+    else:
+        executor = None
+        predictions_iter = map(model.predict, chunks)
+
+    try:
+        for chunk, chunk_predictions in zip(chunks, predictions_iter):
+            results.append(chunk_predictions)
+            done += len(chunk)
+            if progress is not None:
+                progress(done, len(frame))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    predictions = np.concatenate(results) if results else np.empty(0, dtype=int)
+    return [
+        (student_id, class_num, predictions[start:stop].tolist())
+        for (student_id, class_num), (start, stop) in index.slices()
+    ]
+
+
+def score_keys(model, index, keys):
+    """Предсказания для выбранных пар (ученик, класс) одним вызовом модели."""
+    keys = [key for key in keys if key in index]
+    if not keys:
+        return []
+    parts = [index.get(student_id, class_num) for student_id, class_num in keys]
+    predictions = model.predict(pd.concat(parts))
+    rows = []
+    start = 0
+    for (student_id, class_num), part in zip(keys, parts):
+        rows.append((student_id, class_num, predictions[start:start + len(part)].tolist()))
+        start += len(part)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетный расчет предсказаний для всей школы")
+    parser.add_argument('--data', type=Path, default=BASE_DIR / 'data.csv')
+    parser.add_argument('--model', type=Path, help="по умолчанию — активная модель реестра models/ или model_1.pkl")
+    parser.add_argument('--db', type=Path, default=BASE_DIR / 'website_data.db')
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=1, help="число процессов для расчета")
+    parser.add_argument('--rebuild-summary', action='store_true',
+                        help="пересчитать сводки по классам целиком, без расчета модели")
+    args = parser.parse_args()
+
+    saves = SavesDataPredictions(args.db)
+    saves.create_table()
+    if args.rebuild_summary:
+        saves.rebuild_summary()
+        print("Сводки по классам пересчитаны")
+        return
+
+    if args.model is None:
+        from model_registry import active_model_path
+        args.model = active_model_path()
+
+    start = time.perf_counter()
+    index = GradesStore(args.data).index.compacted()
+    version = model_version(args.model)
+    model = flatten(joblib.load(args.model), version)
+
+    def progress(done, total):
+        print(f"\rОбработано строк: {done}/{total}", end="", file=sys.stderr, flush=True)
+
+    rows = score_index(model, index, args.model, args.chunk_size, args.workers, progress)
+    print(file=sys.stderr)
+
+    saves.save_predictions(rows, version)
+    print(f"Сохранено предсказаний: {len(rows)} (модель {version}) "
+          f"за {time.perf_counter() - start:.1f} с")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Сессии пользователей на сервере: кто вошел и какие оценки ему уже посчитаны.
+
+Токен сессии хранится в браузере (gr.BrowserState), сама сессия — здесь.
+Сессия живет ttl секунд с последнего обращения; сессий не больше
+max_sessions, при переполнении вытесняются давно не использованные.
+"""
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_TTL = float(os.environ.get("SESSION_TTL", 30 * 60))
+SESSION_MAX = int(os.environ.get("SESSION_MAX", 10000))
+
+
+class Session:
+    """Вошедший пользователь и его последние предсказания по классам."""
+
+    __slots__ = ('user_id', 'login', 'type', 'student_id', 'class_num', 'predictions', 'expires')
+
+    def __init__(self, user_id, login, type, student_id=None, class_num=None):
+        self.user_id = user_id
+        self.login = login
+        self.type = type
+        self.student_id = student_id
+        self.class_num = class_num
+        # класс -> (версия модели, оценки)
+        self.predictions = {}
+        self.expires = 0.0
+
+    def get_prediction(self, class_num, version):
+        item = self.predictions.get(class_num)
+        if item is None or item[0] != version:
+            return None
+        return item[1]
+
+
+class SessionStore:
+    """Сессии по токену: LRU с ограниченным временем жизни (скользящим)."""
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=SESSION_MAX):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def create(self, session):
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            session.expires = time.monotonic() + self.ttl
+            self._items[token] = session
+            self.created += 1
+            while len(self._items) > self.max_sessions:
+                self._items.popitem(last=False)
+                self.evicted += 1
+        return token
+
+    def get(self, token):
+        """Сессия по токену (и продление ее срока) или None."""
+        if not token:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            session = self._items.get(token)
+            if session is None:
+                return None
+            if session.expires < now:
+                del self._items[token]
+                self.expired += 1
+                return None
+            session.expires = now + self.ttl
+            self._items.move_to_end(token)
+            return session
+
+    def delete(self, token):
+        with self._lock:
+            self._items.pop(token, None)
+
+    def save_prediction(self, session, class_num, version, prediction):
+        with self._lock:
+            session.predictions[class_num] = (version, list(prediction))
+
+    def forget_predictions(self, student_ids=None):
+        """Сбрасывает сохраненные оценки учеников (или всех, если student_ids не указан)."""
+        with self._lock:
+            for session in self._items.values():
+                if student_ids is None or session.student_id in student_ids:
+                    session.predictions.clear()
+
+    def _evict_expired(self, now):
+        # самые старые по обращению в начале: просматриваем, пока не встретим живую сессию
+        while self._items:
+            token, session = next(iter(self._items.items()))
+            if session.expires >= now:
+                break
+            del self._items[token]
+            self.expired += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'max_sessions': self.max_sessions,
+                'created': self.created,
+                'expired': self.expired,
+                'evicted': self.evicted,
+            }
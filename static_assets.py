@@ -0,0 +1,215 @@
+"""Статические файлы сайта (стили, графики классов) по адресам с отпечатком содержимого.
+
+Адрес включает хэш содержимого (/site/style.3f2a…e1.css), поэтому файл
+можно кэшировать в браузере навсегда: изменившийся файл получит новый
+адрес. Сжатые варианты (gzip, brotli) готовятся один раз при добавлении,
+а не на каждый запрос.
+
+Страница и конфигурация Gradio (/, /config) встроенным сжатием Gradio не
+обрабатываются (оно смотрит на расширение файла), их сжимает PageCompression.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # brotli ставится вместе с gradio, но сайт работает и без него
+    brotli = None
+
+PREFIX = "/site"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+MEDIA_TYPES = {
+    'css': 'text/css; charset=utf-8',
+    'svg': 'image/svg+xml',
+    'js': 'text/javascript; charset=utf-8',
+}
+# меньше этого сжатие не окупается
+MIN_COMPRESS_SIZE = 512
+
+
+def _compressed(body):
+    """Варианты тела: {кодировка: байты}; сжатые — только если они меньше исходного."""
+    variants = {}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            variants['br'] = brotli.compress(body, quality=11)
+    variants = {encoding: data for encoding, data in variants.items() if len(data) < len(body)}
+    variants['identity'] = body
+    return variants
+
+
+def choose_encoding(variants, accept_encoding):
+    accepted = {part.split(';')[0].strip() for part in accept_encoding.lower().split(',')}
+    for encoding in ('br', 'gzip'):
+        if encoding in variants and encoding in accepted:
+            return encoding
+    return 'identity'
+
+
+class Asset:
+    __slots__ = ('name', 'media_type', 'etag', 'variants', 'size')
+
+    def __init__(self, name, media_type, etag, variants):
+        self.name = name
+        self.media_type = media_type
+        self.etag = etag
+        self.variants = variants
+        self.size = sum(len(data) for data in variants.values())
+
+
+class AssetStore:
+    """Файлы в памяти по имени с отпечатком.
+
+    pinned-файлы (стили) хранятся всегда; остальные (графики) вытесняются
+    по давности обращения, когда их суммарный размер больше max_bytes.
+    """
+
+    def __init__(self, prefix=PREFIX, max_bytes=8 * 1024 * 1024):
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self._pinned = {}
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.not_modified = 0
+        self.misses = 0
+        self.added = 0
+
+    def add(self, name, content, ext, pinned=False):
+        """Сохраняет файл и возвращает его адрес; одинаковое содержимое дает тот же адрес."""
+        body = content.encode('utf-8') if isinstance(content, str) else bytes(content)
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        filename = f"{name}.{digest}.{ext}"
+        with self._lock:
+            if filename in self._pinned:
+                return self.url(filename)
+            if filename in self._items:
+                self._items.move_to_end(filename)
+                return self.url(filename)
+        asset = Asset(filename, MEDIA_TYPES.get(ext, 'application/octet-stream'), f'"{digest}"', _compressed(body))
+        with self._lock:
+            self.added += 1
+            if pinned:
+                self._pinned[filename] = asset
+            elif filename not in self._items:
+                self._items[filename] = asset
+                self._size += asset.size
+                while self._size > self.max_bytes and len(self._items) > 1:
+                    _, old = self._items.popitem(last=False)
+                    self._size -= old.size
+        return self.url(filename)
+
+    def url(self, filename):
+        return f"{self.prefix}/{filename}"
+
+    def get(self, filename):
+        with self._lock:
+            asset = self._pinned.get(filename)
+            if asset is None:
+                asset = self._items.get(filename)
+                if asset is not None:
+                    self._items.move_to_end(filename)
+            if asset is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return asset
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pinned': len(self._pinned),
+                'entries': len(self._items),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'not_modified': self.not_modified,
+                'misses': self.misses,
+                'added': self.added,
+            }
+
+    def response(self, filename, headers):
+        """Ответ starlette на запрос файла с заголовками запроса headers."""
+        from starlette.responses import Response
+
+        asset = self.get(filename)
+        if asset is None:
+            return Response(status_code=404)
+        common = {'Cache-Control': CACHE_CONTROL, 'ETag': asset.etag, 'Vary': 'Accept-Encoding'}
+        if headers.get('if-none-match') == asset.etag:
+            with self._lock:
+                self.not_modified += 1
+            return Response(status_code=304, headers=common)
+        encoding = choose_encoding(asset.variants, headers.get('accept-encoding', ''))
+        if encoding != 'identity':
+            common['Content-Encoding'] = encoding
+        return Response(asset.variants[encoding], media_type=asset.media_type, headers=common)
+
+
+def add_route(app, store):
+    """GET {prefix}/{имя} на приложении FastAPI, на котором работает Gradio."""
+    from starlette.requests import Request
+
+    def endpoint(filename: str, request: Request):
+        return store.response(filename, request.headers)
+
+    app.add_api_route(f"{store.prefix}/{{filename}}", endpoint, methods=["GET"], include_in_schema=False)
+
+
+class PageCompression:
+    """ASGI-middleware: сжимает ответы на пути paths (страница и конфигурация Gradio).
+
+    Ответы этих путей небольшие и не потоковые, поэтому тело собирается
+    целиком и сжимается одним вызовом. Уже сжатые ответы не трогаются.
+    """
+
+    def __init__(self, app, paths=("/", "/config", "/config/"), gzip_level=6, brotli_quality=5):
+        self.app = app
+        self.paths = set(paths)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        accept = dict(scope["headers"]).get(b"accept-encoding", b"").decode('latin-1').lower()
+        accepted = {part.split(';')[0].strip() for part in accept.split(',')}
+        if 'br' in accepted and brotli is not None:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return await self.app(scope, receive, send)
+
+        start = None
+        chunks = []
+
+        async def buffered_send(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            await send_compressed(b"".join(chunks))
+
+        async def send_compressed(body):
+            headers = [(key, value) for key, value in start["headers"] if key.lower() != b"content-length"]
+            if len(body) >= MIN_COMPRESS_SIZE and not any(key.lower() == b"content-encoding" for key, _ in headers):
+                if encoding == 'br':
+                    body = brotli.compress(body, quality=self.brotli_quality)
+                else:
+                    body = gzip.compress(body, compresslevel=self.gzip_level)
+                headers += [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+            headers.append((b"content-length", str(len(body)).encode()))
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, buffered_send)
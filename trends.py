@@ -0,0 +1,167 @@
+"""Ряды средней оценки учеников по четвертям 8–11 классов.
+
+Точка ряда — (ученик, класс, четверть): средняя оценка (Average_grade) и
+среднее Perform_trend по строкам этой четверти. Точки всех учеников лежат
+в общих массивах подряд по ученику и времени, границы ученика — offsets
+(как в CSR-матрице). Скользящее среднее и наклон за последние window
+четвертей считаются для всех точек сразу (window проходов по массивам), поэтому
+страница ученика берет готовый срез, а рейтинг ухудшения по классу —
+один проход по массивам, без фильтрации DataFrame по каждому ученику.
+"""
+import threading
+
+import numpy as np
+
+FIRST_CLASS = 8
+PERIODS = 4
+# окно скользящего среднего и наклона: учебный год
+WINDOW = 4
+# наклон меньше этого по модулю (оценки за четверть) считается ровным рядом
+STABLE_SLOPE = 0.005
+# знаков наклона при сравнении в списке снижения
+SLOPE_DECIMALS = 9
+
+
+def _columns(index):
+    """Нужные столбцы индекса оценок вместе с дописанными строками (delta)."""
+    frames = [index.frame] + ([index.delta.frame] if index.delta is not None else [])
+    names = ('Student', 'Class', 'Period', 'Average_grade', 'Perform_trend')
+    return [np.concatenate([frame[name].to_numpy() for frame in frames]) for name in names]
+
+
+def _window_stats(x, y, lo, window):
+    """Среднее y и наклон y по x в окне [lo[i], i] для всех i.
+
+    Суммы копятся по сдвигам 1..window-1 от разностей с точкой i, а не по
+    накопленной сумме всего массива: точность не падает с размером школы,
+    и у ровного ряда наклон ровно 0.
+    """
+    n = np.ones(len(x))
+    sum_dx, sum_dy, sum_dxx, sum_dxy = (np.zeros(len(x)) for _ in range(4))
+    points = np.arange(len(x))
+    for shift in range(1, window):
+        current = points[points - shift >= lo]
+        dx = x[current - shift] - x[current]
+        dy = y[current - shift] - y[current]
+        n[current] += 1
+        sum_dx[current] += dx
+        sum_dy[current] += dy
+        sum_dxx[current] += dx * dx
+        sum_dxy[current] += dx * dy
+    denominator = n * sum_dxx - sum_dx * sum_dx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # наклон МНК; у одной точки — 0
+        slopes = np.where(denominator > 0, (n * sum_dxy - sum_dx * sum_dy) / denominator, 0.0)
+    return y + sum_dy / n, slopes
+
+
+def describe_slope(slope):
+    if slope > STABLE_SLOPE:
+        return f"растет (+{slope:.3f} за четверть)"
+    if slope < -STABLE_SLOPE:
+        return f"снижается ({slope:.3f} за четверть)"
+    return "держится на одном уровне"
+
+
+class TrendStore:
+    """Ряды всех учеников в массивах; строится за один проход по таблице оценок."""
+
+    def __init__(self, students, classes, periods, averages, perform_trends, window=WINDOW):
+        self.window = window
+        key = (students.astype(np.int64) << 16) | (classes.astype(np.int64) << 8) | periods.astype(np.int64)
+        points, first, inverse, counts = np.unique(key, return_index=True, return_inverse=True, return_counts=True)
+        point_students = points >> 16
+        self.classes = ((points >> 8) & 0xFF).astype(np.int16)
+        self.periods = (points & 0xFF).astype(np.int16)
+        # номер четверти от начала 8 класса: ось времени для наклона
+        self.steps = (self.classes - FIRST_CLASS) * PERIODS + self.periods - 1
+        self.averages = averages[first].astype(np.float64)
+        self.perform_trends = np.bincount(inverse, weights=perform_trends, minlength=len(points)) / counts
+
+        self.student_ids, starts = np.unique(point_students, return_index=True)
+        self.offsets = np.append(starts, len(points))
+        self._positions = {int(student_id): i for i, student_id in enumerate(self.student_ids.tolist())}
+        self._owners = np.repeat(np.arange(len(self.student_ids)), np.diff(self.offsets))
+
+        # окно [lo, i] не выходит за начало ряда ученика
+        lo = np.maximum(np.arange(len(points)) - window + 1, self.offsets[self._owners])
+        # slopes — изменение средней оценки за четверть
+        self.rolling, self.slopes = _window_stats(self.steps.astype(np.float64), self.averages, lo, window)
+
+    @classmethod
+    def from_index(cls, index, window=WINDOW):
+        return cls(*_columns(index), window=window)
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    def __contains__(self, student_id):
+        return int(student_id) in self._positions
+
+    def series(self, student_id):
+        """Ряд ученика: словарь массивов classes, periods, averages, rolling, slopes, perform_trends или None."""
+        position = self._positions.get(int(student_id))
+        if position is None:
+            return None
+        part = slice(self.offsets[position], self.offsets[position + 1])
+        return {
+            'classes': self.classes[part],
+            'periods': self.periods[part],
+            'averages': self.averages[part],
+            'rolling': self.rolling[part],
+            'slopes': self.slopes[part],
+            'perform_trends': self.perform_trends[part],
+        }
+
+    def decline(self, class_num, limit=10):
+        """Ученики с самым сильным снижением к концу class_num класса: [(student_id, наклон, средняя)].
+
+        Берется последняя четверть каждого ученика в этом классе и наклон за
+        window четвертей до нее; в список попадают наклоны ниже -STABLE_SLOPE.
+        """
+        in_class = self.classes == class_num
+        # последняя точка ученика в классе: следующая точка другого ученика или другого класса
+        following = np.append(in_class[1:] & (self._owners[1:] == self._owners[:-1]), False)
+        last = np.flatnonzero(in_class & ~following)
+        last = last[self.slopes[last] < -STABLE_SLOPE]
+        # наклоны, равные до ошибки округления, сравниваются как равные
+        rank = np.round(self.slopes[last], SLOPE_DECIMALS)
+        if len(last) > limit:
+            # все ученики с наклоном не выше limit-го: при равенстве на границе выбор по номеру ниже
+            keep = rank <= np.partition(rank, limit - 1)[limit - 1]
+            last, rank = last[keep], rank[keep]
+        students = self.student_ids[self._owners[last]]
+        # при равном наклоне — по номеру ученика
+        order = np.lexsort((students, rank))[:limit]
+        return list(zip(students[order].tolist(), self.slopes[last][order].tolist(),
+                        self.averages[last][order].tolist()))
+
+
+class TrendIndex:
+    """TrendStore для текущей таблицы оценок: пересобирается, когда индекс оценок сменился."""
+
+    def __init__(self, grades_resource, window=WINDOW):
+        self._grades = grades_resource
+        self.window = window
+        self._lock = threading.Lock()
+        self._index = None
+        self._store = None
+        self.builds = 0
+
+    def get(self):
+        grades_store = self._grades.get()
+        grades_store.refresh()
+        index = grades_store.index
+        with self._lock:
+            if self._index is not index:
+                self._store = TrendStore.from_index(index, self.window)
+                self._index = index
+                self.builds += 1
+            return self._store
+
+    def stats(self):
+        with self._lock:
+            return {
+                'students': len(self._store) if self._store is not None else 0,
+                'builds': self.builds,
+            }